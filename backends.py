@@ -0,0 +1,172 @@
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from request_control import TokenBucket
+
+SINGLE_PAIR_PATTERN = re.compile(r"^Input: (.+) \+ (.+)$", re.MULTILINE)
+BATCH_PAIR_PATTERN = re.compile(r"^(\d+)\. (.+) \+ (.+)$", re.MULTILINE)
+
+FAKE_EMOJIS = ["🔥", "💧", "🌍", "💨", "⚡", "🌋", "🌊", "🧪", "🌱", "🧱", "☁️", "🌀", "✨", "🪨", "🧊", "🌟"]
+
+
+class ModelBackend:
+    """Turns a prompt into the model's raw text reply"""
+
+    def generate(self, prompt):
+        raise NotImplementedError
+
+
+class GeminiBackend(ModelBackend):
+    """Gemini through google.generativeai.
+
+    The SDK is slow to import, so it is only imported and configured on the
+    first call, which is the first real cache miss rather than startup.
+    """
+
+    def __init__(self, api_key, model_name='gemini-2.0-flash'):
+        self.api_key = api_key
+        self.model_name = model_name
+        self.model = None
+        self._lock = threading.Lock()
+
+    def _get_model(self):
+        with self._lock:
+            if self.model is None:
+                import google.generativeai as genai
+
+                genai.configure(api_key=self.api_key)
+                self.model = genai.GenerativeModel(self.model_name)
+            return self.model
+
+    def generate(self, prompt):
+        return self._get_model().generate_content(prompt).text
+
+
+class FakeBackend(ModelBackend):
+    """Deterministic local stand-in for the model, for tests and load testing.
+
+    The same pair always produces the same element, drawn from a closed
+    vocabulary so crawls converge. latency (+/- jitter) is slept per call,
+    error_rate raises on that fraction of calls, and max_rps caps how many
+    calls per second the fake "server" will answer.
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, max_rps=None,
+                 vocabulary=5000, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.vocabulary = vocabulary
+        self.seed = seed
+        self._throttle = TokenBucket(max_rps) if max_rps else None
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+
+    def generate(self, prompt):
+        with self._lock:
+            self.calls += 1
+            delay = self.latency + self._random.uniform(-self.jitter, self.jitter)
+            fail = self._random.random() < self.error_rate
+            if fail:
+                self.errors += 1
+
+        if self._throttle:
+            self._throttle.acquire()
+        if delay > 0:
+            time.sleep(delay)
+        if fail:
+            raise RuntimeError("FakeBackend: injected error")
+
+        batch = BATCH_PAIR_PATTERN.findall(prompt)
+        if batch:
+            return json.dumps([{"id": int(i), "result": self.combine(a, b)} for i, a, b in batch],
+                              ensure_ascii=False)
+
+        pairs = SINGLE_PAIR_PATTERN.findall(prompt)
+        if not pairs:
+            return "❓Unknown"
+        # The few-shot examples also start with "Input:", the real pair is last
+        return self.combine(*pairs[-1])
+
+    def combine(self, el1, el2):
+        a, b = sorted((el1.strip().lower(), el2.strip().lower()))
+        digest = hashlib.blake2b(f"{self.seed}|{a}|{b}".encode('utf-8'), digest_size=8).digest()
+        value = int.from_bytes(digest, 'big')
+        emoji = FAKE_EMOJIS[value % len(FAKE_EMOJIS)]
+        return f"{emoji}Element {value % self.vocabulary}"
+
+
+class HttpBackend(ModelBackend):
+    """Talks to a stand-in server speaking {"prompt"} -> {"text"} JSON over HTTP"""
+
+    def __init__(self, url, timeout=30):
+        self.url = url
+        self.timeout = timeout
+
+    def generate(self, prompt):
+        body = json.dumps({"prompt": prompt}).encode('utf-8')
+        request = urllib.request.Request(self.url, data=body,
+                                         headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.loads(response.read().decode('utf-8'))["text"]
+
+
+def serve_backend(backend, host='127.0.0.1', port=8765):
+    """Serve any backend over HTTP for HttpBackend clients"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length', 0))
+            try:
+                prompt = json.loads(self.rfile.read(length))["prompt"]
+                payload, status = {"text": backend.generate(prompt)}, 200
+            except Exception as e:
+                payload, status = {"error": str(e)}, 503
+            data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass  # one line per request would swamp a load test
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    print(f"Serving {type(backend).__name__} on http://{host}:{port}/")
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local stand-in model server backed by FakeBackend")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.2, help="Seconds per call")
+    parser.add_argument('--jitter', type=float, default=0.05)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--max-rps', type=float, default=None)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    backend = FakeBackend(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                          max_rps=args.max_rps, seed=args.seed)
+    server = serve_backend(backend, args.host, args.port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
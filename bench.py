@@ -0,0 +1,256 @@
+import argparse
+import os
+import random
+import tempfile
+import time
+
+# Headless unless told otherwise; must be set before pygame is imported
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+
+from backends import FakeBackend
+from cache_store import JournaledCacheStore
+from game import SCREEN_HEIGHT, SCREEN_WIDTH, Game
+from game_logic import ElementCombiner
+from input_trace import load_trace, save_trace
+from prefetch import Prefetcher
+from profiler import default_profiler
+
+FRAME_MS = 16  # game time between scripted frames, about 60 FPS
+
+# Drop targets that keep dragged elements clear of the sidebar
+CANVAS_X = (110, 420)
+CANVAS_Y = (25, 575)
+
+
+def mouse(event_type, pos, **fields):
+    return pygame.event.Event(event_type, pos=pos, **fields)
+
+
+def drag_frames(start, end, now, steps=4):
+    """Frames for one press, drag and release from start to end"""
+    frames = [(now, [mouse(pygame.MOUSEBUTTONDOWN, start, button=1)])]
+    previous = start
+    for i in range(1, steps + 1):
+        now += FRAME_MS
+        pos = (start[0] + (end[0] - start[0]) * i // steps,
+               start[1] + (end[1] - start[1]) * i // steps)
+        rel = (pos[0] - previous[0], pos[1] - previous[1])
+        frames.append((now, [mouse(pygame.MOUSEMOTION, pos, rel=rel, buttons=(1, 0, 0))]))
+        previous = pos
+    now += FRAME_MS
+    frames.append((now, [mouse(pygame.MOUSEBUTTONUP, end, button=1)]))
+    return frames, now + FRAME_MS
+
+
+def sidebar_row_centers(game, rows=8):
+    return [rect.center for _, rect in game.get_element_rects()[:rows]]
+
+
+def drags_session(game, count=10000, seed=0):
+    """Drag sidebar elements to random canvas spots; overlapping drops combine"""
+    rng = random.Random(seed)
+    rows = sidebar_row_centers(game, rows=4)  # the base elements
+    frames, now = [], 0
+    for _ in range(count):
+        target = (rng.randint(*CANVAS_X), rng.randint(*CANVAS_Y))
+        drag, now = drag_frames(rng.choice(rows), target, now)
+        frames.extend(drag)
+    return frames
+
+
+def combines_session(game, count=2000, seed=0):
+    """Pairs of drags onto the same spot, so every second drop combines"""
+    rng = random.Random(seed)
+    rows = sidebar_row_centers(game, rows=4)
+    frames, now = [], 0
+    for _ in range(count):
+        target = (rng.randint(*CANVAS_X), rng.randint(*CANVAS_Y))
+        for _ in range(2):
+            drag, now = drag_frames(rng.choice(rows), target, now)
+            frames.extend(drag)
+    return frames
+
+
+def sidebar_session(game, count=2000, seed=0):
+    """Scroll, hover and type-to-filter over a large sidebar"""
+    rng = random.Random(seed)
+    rect = game.sidebar_rect
+    frames, now = [], 0
+    for i in range(count):
+        pos = (rng.randint(rect.x + 20, rect.right - 30), rng.randint(rect.y + 70, rect.bottom - 10))
+        events = [mouse(pygame.MOUSEMOTION, pos, rel=(0, 0), buttons=(0, 0, 0)),
+                  pygame.event.Event(pygame.MOUSEWHEEL, x=0, y=rng.choice((-3, -1, 1)))]
+        if i % 50 == 10:
+            # Type a short query one character per frame, then clear it
+            for char in f"ment {rng.randrange(100)}":
+                frames.append((now, [pygame.event.Event(pygame.TEXTINPUT, text=char)]))
+                now += FRAME_MS
+            events.append(pygame.event.Event(pygame.KEYDOWN, key=pygame.K_ESCAPE, mod=0))
+        frames.append((now, events))
+        now += FRAME_MS
+    return frames
+
+
+SCENARIOS = {
+    "drags": (drags_session, 0),
+    "combines": (combines_session, 0),
+    "sidebar": (sidebar_session, 5000),
+}
+
+
+def make_game(cache_dir, latency=0.05, calls_per_second=None, sidebar_size=0, full_redraw=False,
+              prefetch=False, seed=0):
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    store = JournaledCacheStore(base_path=os.path.join(cache_dir, 'cache'), legacy_path=None, fsync=False)
+    # The game's own quota pacing applies unless calls_per_second overrides it
+    limits = {"calls_per_second": calls_per_second} if calls_per_second else {}
+    combiner = ElementCombiner(backend=FakeBackend(latency=latency, seed=seed), store=store,
+                               compiled_path=None, **limits)
+    prefetcher = Prefetcher(combiner) if prefetch else None
+    game = Game(screen, combiner, prefetcher=prefetcher, dirty_rendering=not full_redraw)
+    for i in range(sidebar_size):
+        game.add_discovered_element(f"🧪Element {i}")
+    return game
+
+
+def present(game, update_rects):
+    with game.profiler.span("present"):
+        if update_rects is None:
+            pygame.display.flip()
+        elif update_rects:
+            pygame.display.update(update_rects)
+
+
+def run_session(game, frames, realtime=False, settle_timeout=10.0):
+    """Replay frames and report frame cost and combine latency.
+
+    Frames run back to back unless realtime is set, in which case each one
+    waits for its recorded time. Back to back, combinations arrive faster
+    than a player could make them, so their latency includes queueing.
+    After the last frame, empty frames keep being stepped until every
+    in-flight combination has landed, so each one gets a latency sample.
+    Those settling frames are not counted in the frame statistics.
+    """
+    profiler = game.profiler
+    profiler.reset()
+    frame_times = []
+    event_count = 0
+    now = 0
+    origin = time.perf_counter() - (frames[0][0] / 1000 if frames else 0)
+    for now, events in frames:
+        if realtime:
+            time.sleep(max(0.0, origin + now / 1000 - time.perf_counter()))
+        started = time.perf_counter()
+        profiler.begin_frame()
+        present(game, game.step(events, now))
+        profiler.end_frame()
+        frame_times.append(time.perf_counter() - started)
+        event_count += len(events)
+
+    deadline = time.perf_counter() + settle_timeout
+    while game.has_pending() and time.perf_counter() < deadline:
+        now += FRAME_MS
+        present(game, game.step([], now))
+        time.sleep(0.001)
+
+    frame_times.sort()
+    latencies = sorted(game.combine_latencies)
+    busy = sum(frame_times)
+
+    def percentile(values, p):
+        return values[min(len(values) - 1, int(len(values) * p))] * 1000 if values else float('nan')
+
+    return {
+        "frames": len(frame_times),
+        "events": event_count,
+        "events_per_s": event_count / busy if busy else float('nan'),
+        "frame_p50_ms": percentile(frame_times, 0.50),
+        "frame_p90_ms": percentile(frame_times, 0.90),
+        "frame_p99_ms": percentile(frame_times, 0.99),
+        "frame_max_ms": frame_times[-1] * 1000 if frame_times else float('nan'),
+        "combines": len(latencies),
+        "combine_p50_ms": percentile(latencies, 0.50),
+        "combine_p99_ms": percentile(latencies, 0.99),
+        "canvas_elements": len(game.canvas_elements),
+        "sidebar_elements": len(game.sidebar.elements),
+        "cache": game.combiner.stats(),
+        # Mean ms per counted frame for each span; empty unless profiling
+        "phases": profiler.phase_averages(recent=False),
+    }
+
+
+def report(name, stats):
+    print(f"{name}: {stats['frames']} frames, {stats['events']} events "
+          f"({stats['events_per_s']:.0f} events/s)")
+    print(f"  frame p50 {stats['frame_p50_ms']:.2f}ms  p90 {stats['frame_p90_ms']:.2f}ms  "
+          f"p99 {stats['frame_p99_ms']:.2f}ms  max {stats['frame_max_ms']:.2f}ms")
+    print(f"  {stats['combines']} combines, latency p50 {stats['combine_p50_ms']:.2f}ms  "
+          f"p99 {stats['combine_p99_ms']:.2f}ms")
+    print(f"  ended with {stats['canvas_elements']} canvas and {stats['sidebar_elements']} sidebar elements")
+    cache = stats['cache']
+    print(f"  cache hit rate {cache['hit_rate']:.1%} ({cache['hot_hits']} hot, {cache['cold_hits']} cold, "
+          f"{cache['misses']} misses), {cache['api_calls']} model calls")
+    if stats['phases']:
+        print("  " + "  ".join(f"{name} {ms:.3f}ms" for name, ms in
+                               sorted(stats['phases'].items(), key=lambda item: -item[1])))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay scripted or recorded sessions headless and time them")
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS),
+                        help="Scenario to run (repeatable, default all)")
+    parser.add_argument('--count', type=int, help="Drags, drag pairs or sidebar frames per scenario")
+    parser.add_argument('--sidebar-size', type=int, help="Extra elements in the sidebar")
+    parser.add_argument('--trace', help="Replay a trace recorded with python main.py --record")
+    parser.add_argument('--save-traces', metavar='DIR', help="Also write each scripted session as a trace")
+    parser.add_argument('--latency', type=float, default=0.05, help="Fake model seconds per call")
+    parser.add_argument('--calls-per-second', type=float, help="Override the combiner's model rate limit")
+    parser.add_argument('--realtime', action='store_true', help="Pace frames at their recorded times")
+    parser.add_argument('--full-redraw', action='store_true')
+    parser.add_argument('--prefetch', action='store_true')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--profile', action='store_true', help="Time each phase of the frame and report it")
+    parser.add_argument('--profile-trace', metavar='PATH', help="Also write the spans to a Chrome trace file")
+    args = parser.parse_args()
+
+    pygame.init()
+    if args.profile_trace:
+        default_profiler.start_trace(args.profile_trace)
+    default_profiler.enabled = args.profile or bool(args.profile_trace)
+    options = dict(latency=args.latency, calls_per_second=args.calls_per_second, full_redraw=args.full_redraw, prefetch=args.prefetch, seed=args.seed)
+
+    if args.trace:
+        runs = [(os.path.basename(args.trace), None, args.sidebar_size or 0)]
+    else:
+        runs = [(name, SCENARIOS[name][0], SCENARIOS[name][1] if args.sidebar_size is None else args.sidebar_size)
+                for name in args.scenario or sorted(SCENARIOS)]
+
+    for name, session, sidebar_size in runs:
+        with tempfile.TemporaryDirectory() as tmp:
+            game = make_game(tmp, sidebar_size=sidebar_size, **options)
+            if session is None:
+                frames = load_trace(args.trace)
+            else:
+                kwargs = {"seed": args.seed}
+                if args.count:
+                    kwargs["count"] = args.count
+                frames = session(game, **kwargs)
+                if args.save_traces:
+                    os.makedirs(args.save_traces, exist_ok=True)
+                    save_trace(os.path.join(args.save_traces, f"{name}.trace"), frames)
+
+            stats = run_session(game, frames, realtime=args.realtime)
+            game.combiner.shutdown(wait=True)
+            if game.prefetcher:
+                game.prefetcher.shutdown()
+            report(name, stats)
+
+    default_profiler.stop_trace()
+    pygame.quit()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,202 @@
+import json
+import logging
+import os
+import threading
+
+LEGACY_CACHE_FILENAME = 'element_cache.json'
+
+log = logging.getLogger(__name__)
+
+
+class JournaledCacheStore:
+    """Append-only storage for the combination cache.
+
+    Every new entry is appended as one JSON line to ``<base>.log``. Once the
+    log grows past the size of the snapshot it is rotated and folded into
+    ``<base>.snapshot`` on a background thread. Both files are plain JSON
+    lines of ``[key, value]`` pairs, so a torn write can only ever damage the
+    last line of the log, which is dropped on the next load.
+    """
+
+    def __init__(self, base_path='element_cache', legacy_path=LEGACY_CACHE_FILENAME,
+                 compact_threshold=1000, fsync=True):
+        self.snapshot_path = base_path + '.snapshot'
+        self.log_path = base_path + '.log'
+        self.rotated_log_path = base_path + '.log.old'
+        self.legacy_path = legacy_path
+        self.compact_threshold = compact_threshold
+        self.fsync = fsync
+
+        self._lock = threading.Lock()
+        self._log_file = None
+        self._snapshot_count = 0
+        self._log_count = 0
+        self._compaction = None
+
+    # Loading / recovery
+
+    def load(self):
+        """Rebuild the cache dict from snapshot + logs and open the log for appends"""
+        with self._lock:
+            self._wait_for_compaction()
+            self._close_log()
+
+            # A leftover temp file means a compaction died before its rename
+            tmp_path = self.snapshot_path + '.tmp'
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+            if (self.legacy_path and not self._has_store_files()
+                    and os.path.exists(self.legacy_path)):
+                self._import_legacy()
+
+            cache = {}
+            self._snapshot_count = self._replay(self.snapshot_path, cache)
+            if os.path.exists(self.rotated_log_path):
+                # A compaction died before folding its rotated log in. Finish
+                # it now; while the rotated log exists no new one can start.
+                self._replay(self.rotated_log_path, cache)
+                self._write_snapshot(cache.items())
+                os.remove(self.rotated_log_path)
+                self._snapshot_count = len(cache)
+            self._log_count = self._replay(self.log_path, cache, repair=True)
+
+            self._log_file = open(self.log_path, 'a', encoding='utf-8')
+            return cache
+
+    def _has_store_files(self):
+        return any(os.path.exists(p) for p in
+                   (self.snapshot_path, self.log_path, self.rotated_log_path))
+
+    def _import_legacy(self):
+        """One-time import of the old element_cache.json into a snapshot"""
+        try:
+            with open(self.legacy_path, 'r', encoding='utf-8') as f:
+                content = f.read().strip()
+            legacy = json.loads(content) if content else {}
+        except (OSError, json.JSONDecodeError) as e:
+            log.warning("Could not import %s: %s", self.legacy_path, e)
+            return
+        self._write_snapshot(legacy.items())
+        log.info("Imported %d entries from %s", len(legacy), self.legacy_path)
+
+    def _replay(self, path, cache, repair=False):
+        """Apply every complete line of a journal file to cache, return the line count"""
+        if not os.path.exists(path):
+            return 0
+
+        count = 0
+        good_bytes = 0
+        with open(path, 'rb') as f:
+            for raw in f:
+                if not raw.endswith(b'\n'):
+                    break  # torn final write
+                try:
+                    key, value = json.loads(raw)
+                except (ValueError, TypeError):
+                    break
+                cache[key] = value
+                count += 1
+                good_bytes += len(raw)
+
+        if repair and good_bytes != os.path.getsize(path):
+            log.warning("Dropping damaged tail of %s", path)
+            with open(path, 'r+b') as f:
+                f.truncate(good_bytes)
+        return count
+
+    # Appending
+
+    def append(self, entries):
+        """Persist new entries; cost depends only on the entries written"""
+        lines = ''.join(json.dumps([key, value], ensure_ascii=False) + '\n'
+                        for key, value in entries.items())
+        if not lines:
+            return
+
+        with self._lock:
+            if self._log_file is None:
+                self._log_file = open(self.log_path, 'a', encoding='utf-8')
+            self._log_file.write(lines)
+            self._log_file.flush()
+            if self.fsync:
+                os.fsync(self._log_file.fileno())
+            self._log_count += len(entries)
+
+            if self._log_count >= max(self.compact_threshold, self._snapshot_count):
+                self._start_compaction()
+
+    def replace_all(self, cache):
+        """Rewrite the store so it holds exactly the given entries"""
+        with self._lock:
+            self._wait_for_compaction()
+            self._close_log()
+            self._write_snapshot(cache.items())
+            for path in (self.rotated_log_path, self.log_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            self._snapshot_count = len(cache)
+            self._log_count = 0
+            self._log_file = open(self.log_path, 'a', encoding='utf-8')
+
+    # Compaction
+
+    def compact(self, wait=True):
+        """Fold the current log into the snapshot"""
+        with self._lock:
+            if self._log_count:
+                self._start_compaction()
+            compaction = self._compaction
+        if wait and compaction:
+            compaction.join()
+
+    def _start_compaction(self):
+        # Only one rotated log may exist at a time
+        if self._compaction and self._compaction.is_alive():
+            return
+        if os.path.exists(self.rotated_log_path):
+            return
+
+        self._close_log()
+        os.replace(self.log_path, self.rotated_log_path)
+        self._log_file = open(self.log_path, 'a', encoding='utf-8')
+        self._snapshot_count += self._log_count
+        self._log_count = 0
+
+        self._compaction = threading.Thread(target=self._compact_rotated_log,
+                                            name="cache-compaction", daemon=True)
+        self._compaction.start()
+
+    def _compact_rotated_log(self):
+        try:
+            merged = {}
+            self._replay(self.snapshot_path, merged)
+            self._replay(self.rotated_log_path, merged)
+            self._write_snapshot(merged.items())
+            os.remove(self.rotated_log_path)
+        except Exception as e:
+            # The rotated log stays on disk and is replayed on the next load
+            log.warning("Error compacting cache log: %s", e)
+
+    def _write_snapshot(self, items):
+        tmp_path = self.snapshot_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for key, value in items:
+                f.write(json.dumps([key, value], ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+
+    def _wait_for_compaction(self):
+        if self._compaction and self._compaction.is_alive():
+            self._compaction.join()
+
+    def _close_log(self):
+        if self._log_file is not None:
+            self._log_file.close()
+            self._log_file = None
+
+    def close(self):
+        with self._lock:
+            self._wait_for_compaction()
+            self._close_log()
@@ -0,0 +1,142 @@
+from collections import defaultdict
+
+
+class Canvas:
+    """The elements placed on the play area, indexed by position.
+
+    Each element dict gets a stable "id" the first time it is added and
+    keeps it if it is picked up and dropped again. Elements are kept in
+    stacking order (last added is on top) and also bucketed into a uniform
+    grid of cell_size pixels. Point and rect queries only look at the
+    cells they overlap, and removal is O(1) in the number of elements.
+
+    An element's rect must not be moved while it is on the canvas; take it
+    off with remove(), move it, then add() it back.
+
+    The ids of elements added, removed or touch()ed are collected in
+    changed until take_changes() hands them over, so a session can be saved
+    incrementally.
+    """
+
+    def __init__(self, cell_size=64):
+        self.cell_size = cell_size
+        self._elements = {}   # id -> element, bottom to top
+        self._depth = {}      # id -> stacking position, higher is on top
+        self._cells = defaultdict(set)  # (cx, cy) -> ids overlapping that cell
+        self.next_id = 1
+        self._next_depth = 0
+        self.changed = set()  # ids added, removed or touched since take_changes()
+
+    def __len__(self):
+        return len(self._elements)
+
+    def __iter__(self):
+        """Bottom to top, the order elements are drawn in"""
+        return iter(list(self._elements.values()))
+
+    def __reversed__(self):
+        return iter(list(reversed(self._elements.values())))
+
+    def __contains__(self, elem):
+        return self._elements.get(elem.get("id")) is elem
+
+    def get(self, elem_id):
+        return self._elements.get(elem_id)
+
+    def depth(self, elem_id):
+        """Stacking position of an element; higher is on top"""
+        return self._depth[elem_id]
+
+    def add(self, elem, depth=None):
+        """Place elem on top of everything else and return its id.
+
+        depth restores a saved stacking position instead; restored elements
+        must be added bottom to top.
+        """
+        elem_id = elem.get("id")
+        if elem_id is None:
+            elem_id = elem["id"] = self.next_id
+        elif elem_id in self._elements:
+            self.remove(self._elements[elem_id])
+        self.next_id = max(self.next_id, elem_id + 1)
+        if depth is None:
+            depth = self._next_depth
+        self._next_depth = max(self._next_depth, depth + 1)
+
+        self._elements[elem_id] = elem
+        self._depth[elem_id] = depth
+        for cell in self._cells_for(elem["rect"]):
+            self._cells[cell].add(elem_id)
+        self.changed.add(elem_id)
+        return elem_id
+
+    def remove(self, elem):
+        elem_id = elem["id"]
+        del self._elements[elem_id]
+        del self._depth[elem_id]
+        for cell in self._cells_for(elem["rect"]):
+            ids = self._cells[cell]
+            ids.discard(elem_id)
+            if not ids:
+                del self._cells[cell]
+        self.changed.add(elem_id)
+
+    def touch(self, elem):
+        """Note that an element changed in place (e.g. its name)"""
+        self.changed.add(elem["id"])
+
+    def take_changes(self):
+        changed, self.changed = self.changed, set()
+        return changed
+
+    def clear(self):
+        self.changed.update(self._elements)
+        self._elements.clear()
+        self._depth.clear()
+        self._cells.clear()
+
+    def at_point(self, pos):
+        """The topmost element under pos, or None"""
+        x, y = pos
+        ids = self._cells.get((x // self.cell_size, y // self.cell_size), ())
+        hits = [i for i in ids if self._elements[i]["rect"].collidepoint(pos)]
+        if not hits:
+            return None
+        return self._elements[max(hits, key=self._depth.__getitem__)]
+
+    def colliding(self, rect, exclude=None):
+        """Elements overlapping rect, topmost first"""
+        ids = set()
+        for cell in self._cells_for(rect):
+            ids.update(self._cells.get(cell, ()))
+        hits = [self._elements[i] for i in ids
+                if self._elements[i] is not exclude and self._elements[i]["rect"].colliderect(rect)]
+        hits.sort(key=lambda elem: self._depth[elem["id"]], reverse=True)
+        return hits
+
+    def near(self, point, radius):
+        """Elements whose centre lies within radius of point, as (distance_sq, element)"""
+        cx, cy = point
+        ids = set()
+        for cell in self._cell_range(cx - radius, cy - radius, cx + radius, cy + radius):
+            ids.update(self._cells.get(cell, ()))
+        radius_sq = radius * radius
+        found = []
+        for i in ids:
+            elem = self._elements[i]
+            ex, ey = elem["rect"].center
+            distance_sq = (ex - cx) ** 2 + (ey - cy) ** 2
+            if distance_sq <= radius_sq:
+                found.append((distance_sq, elem))
+        return found
+
+    def _cells_for(self, rect):
+        # right/bottom are exclusive, so the last pixel is one less
+        return self._cell_range(rect.left, rect.top,
+                                max(rect.left, rect.right - 1), max(rect.top, rect.bottom - 1))
+
+    def _cell_range(self, left, top, right, bottom):
+        size = self.cell_size
+        return [(cx, cy)
+                for cx in range(int(left // size), int(right // size) + 1)
+                for cy in range(int(top // size), int(bottom // size) + 1)]
@@ -0,0 +1,271 @@
+import argparse
+import json
+import logging
+import os
+import threading
+import urllib.request
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from backends import FakeBackend
+from game_logic import MAX_BATCH_SIZE, ElementCombiner
+from key_normalizer import default_normalizer
+
+log = logging.getLogger(__name__)
+
+
+class MissBatcher:
+    """Gathers cache misses from every client into batched model prompts.
+
+    A miss waits up to window seconds for company; once max_batch misses
+    are waiting, or the window has passed, they go out together through
+    ElementCombiner.combine_many, which also joins pairs already in flight.
+    """
+
+    def __init__(self, combiner, window=0.02, max_batch=MAX_BATCH_SIZE, workers=4):
+        self.combiner = combiner
+        self.window = window
+        self.max_batch = max_batch
+        self._lock = threading.Lock()
+        self._waiting = []  # (pair, future)
+        self._timer = None
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch")
+        self.batches = 0
+
+    def submit(self, el1, el2):
+        future = Future()
+        with self._lock:
+            self._waiting.append(((el1, el2), future))
+            if len(self._waiting) >= self.max_batch:
+                self._flush_locked()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.window, self._flush)
+                self._timer.daemon = True
+                self._timer.start()
+        return future
+
+    def _flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._waiting = self._waiting, []
+        if batch:
+            self.batches += 1
+            self._executor.submit(self._resolve, batch)
+
+    def _resolve(self, batch):
+        try:
+            results = self.combiner.combine_many([pair for pair, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        for pair, future in batch:
+            future.set_result(results[pair])
+
+    def shutdown(self):
+        self._flush()
+        self._executor.shutdown(wait=True)
+
+
+class CombineService:
+    """One ElementCombiner shared by every game on the host.
+
+    All clients read and write the same cache and journal, identical pairs
+    asked by different clients share one model call, and misses that
+    arrive together are batched into one prompt under one rate limit.
+    """
+
+    def __init__(self, combiner, batch_window=0.02):
+        self.combiner = combiner
+        self.batcher = MissBatcher(combiner, window=batch_window)
+        self.requests = 0
+        self.pairs = 0
+        self._lock = threading.Lock()
+
+    def combine(self, pairs):
+        with self._lock:
+            self.requests += 1
+            self.pairs += len(pairs)
+
+        results = [None] * len(pairs)
+        misses = []
+        for i, (el1, el2) in enumerate(pairs):
+            cached = self.combiner.cache.get(self.combiner.make_cache_key(el1, el2))
+            if cached is not None:
+                results[i] = cached
+            else:
+                misses.append((i, self.batcher.submit(el1, el2)))
+        for i, future in misses:
+            results[i] = future.result()
+        return results
+
+    def stats(self):
+        stats = {
+            "requests": self.requests,
+            "pairs": self.pairs,
+            "batches": self.batcher.batches,
+        }
+        stats.update(self.combiner.stats())
+        return stats
+
+    def serve(self, host='127.0.0.1', port=8766):
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                try:
+                    pairs = [tuple(pair) for pair in json.loads(self.rfile.read(length))["pairs"]]
+                    payload, status = {"results": service.combine(pairs)}, 200
+                except Exception as e:
+                    payload, status = {"error": str(e)}, 503
+                self._reply(payload, status)
+
+            def do_GET(self):
+                self._reply(service.stats(), 200)
+
+            def _reply(self, payload, status):
+                data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass  # one line per combination would swamp the console
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        print(f"Combination service on http://{host}:{port}/ "
+              f"({len(self.combiner.cache)} cached entries)")
+        return server
+
+    def shutdown(self):
+        self.batcher.shutdown()
+        self.combiner.shutdown(wait=True)
+
+
+class CombineClient:
+    """Drop-in for ElementCombiner that asks a CombineService instead.
+
+    Supports what the game, the prefetcher and the crawler use:
+    call_gemini_api, combine_async, combine_many, make_cache_key,
+    has_spare_capacity, cache and shutdown. cache only holds answers this
+    client has already received; results never change, so they are safe to
+    keep.
+    """
+
+    def __init__(self, url='http://127.0.0.1:8766/', timeout=60, max_workers=4):
+        self.url = url
+        self.timeout = timeout
+        self.normalizer = default_normalizer
+        self.cache = {}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="client")
+        self._requests = 0  # posts to the service still waiting for a reply
+        self._lock = threading.Lock()
+
+    def make_cache_key(self, el1, el2):
+        return self.normalizer.make_key(el1, el2)
+
+    def has_spare_capacity(self, reserve=1):
+        """Whether a speculative request now would leave real combines unhindered.
+
+        The service owns the rate limit, so this only holds prefetches back
+        while one of this client's own requests is waiting; reserve is
+        accepted for ElementCombiner compatibility.
+        """
+        return not self._requests
+
+    def _post(self, pairs):
+        with self._lock:
+            self._requests += 1
+        try:
+            return self._send(pairs)
+        finally:
+            with self._lock:
+                self._requests -= 1
+
+    def _send(self, pairs):
+        body = json.dumps({"pairs": pairs}, ensure_ascii=False).encode('utf-8')
+        request = urllib.request.Request(self.url, data=body,
+                                         headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.loads(response.read().decode('utf-8'))["results"]
+
+    def combine_many(self, pairs):
+        pairs = list(pairs)
+        results = {}
+        missing = []
+        for pair in pairs:
+            cached = self.cache.get(self.make_cache_key(*pair))
+            if cached is not None:
+                results[pair] = cached
+            elif pair not in missing:
+                missing.append(pair)
+        if missing:
+            try:
+                answers = self._post([list(pair) for pair in missing])
+            except Exception as e:
+                log.warning("Error calling combination service: %s", e)
+                answers = ["❓Unknown"] * len(missing)
+            for pair, answer in zip(missing, answers):
+                results[pair] = answer
+                if answer != "❓Unknown":
+                    self.cache[self.make_cache_key(*pair)] = answer
+        return results
+
+    def call_gemini_api(self, el1, el2):
+        return self.combine_many([(el1, el2)])[(el1, el2)]
+
+    def combine_async(self, el1, el2):
+        cached = self.cache.get(self.make_cache_key(el1, el2))
+        if cached is not None:
+            future = Future()
+            future.set_result(cached)
+            return future
+        return self._executor.submit(self.call_gemini_api, el1, el2)
+
+    def combine_elements(self, el1, el2):
+        """Alternative method name for compatibility"""
+        return self.call_gemini_api(el1, el2)
+
+    def shutdown(self, wait=False):
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Share one cache and model quota between every game on this host")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--api-key', default=os.environ.get('GEMINI_API_KEY'),
+                        help="Gemini API key (defaults to $GEMINI_API_KEY)")
+    parser.add_argument('--fake', action='store_true', help="Answer from FakeBackend instead of Gemini")
+    parser.add_argument('--batch-window', type=float, default=0.02,
+                        help="Seconds a miss waits for others to share its prompt")
+    parser.add_argument('--calls-per-second', type=float, default=5.0)
+    args = parser.parse_args()
+
+    if not args.fake and not args.api_key:
+        parser.error("an API key is required (--api-key or $GEMINI_API_KEY), or pass --fake")
+
+    combiner = ElementCombiner(api_key=args.api_key, calls_per_second=args.calls_per_second,
+                               backend=FakeBackend() if args.fake else None)
+    service = CombineService(combiner, batch_window=args.batch_window)
+    server = service.serve(args.host, args.port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.shutdown()
+
+
+if __name__ == '__main__':
+    main()
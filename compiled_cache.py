@@ -0,0 +1,227 @@
+import argparse
+import mmap
+import os
+import struct
+import sys
+import time
+from collections.abc import Mapping
+
+COMPILED_CACHE_FILENAME = 'element_cache.compiled'
+
+MAGIC = b'ICCACHE\0'
+VERSION = 1
+# magic, version, key count, string count, blob size
+HEADER = struct.Struct('<8sIIII')
+
+
+class CompiledCache(Mapping):
+    """Read-only cache file, memory mapped and searched in place.
+
+    Layout, all integers little-endian u32:
+      header       magic, version, key count n, string count m, blob size
+      offsets      m + 1 offsets into the blob, string i is blob[off[i]:off[i+1]]
+      values       n string ids, the result for key i
+      blob         UTF-8 text of every distinct string
+
+    Keys are strings 0..n-1, stored sorted by their UTF-8 bytes, so a lookup
+    is a binary search over the blob. Results are interned: every distinct
+    result is stored once and shared by all keys that produce it. Nothing is
+    decoded until it is asked for.
+    """
+
+    def __init__(self, path):
+        if sys.byteorder != 'little':
+            raise ValueError("compiled caches can only be mapped on little-endian machines")
+
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, self._count, strings, blob_size = HEADER.unpack_from(self._mmap)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"{path} is not a version {VERSION} compiled cache")
+
+            start = HEADER.size
+            self._blob_start = start + 4 * (strings + 1) + 4 * self._count
+            if self._blob_start + blob_size > len(self._mmap):
+                raise ValueError(f"{path} is truncated")
+
+            self._view = memoryview(self._mmap)
+            self._offsets = self._view[start:start + 4 * (strings + 1)].cast('I')
+            start += 4 * (strings + 1)
+            self._values = self._view[start:start + 4 * self._count].cast('I')
+        except Exception:
+            self.close()
+            raise
+
+    def _string_bytes(self, i):
+        base = self._blob_start
+        return self._mmap[base + self._offsets[i]:base + self._offsets[i + 1]]
+
+    def _find(self, key):
+        """Index of key, or -1"""
+        target = key.encode('utf-8')
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            probe = self._string_bytes(mid)
+            if probe < target:
+                lo = mid + 1
+            elif probe > target:
+                hi = mid
+            else:
+                return mid
+        return -1
+
+    def __getitem__(self, key):
+        i = self._find(key) if isinstance(key, str) else -1
+        if i < 0:
+            raise KeyError(key)
+        return self._string_bytes(self._values[i]).decode('utf-8')
+
+    def __contains__(self, key):
+        return isinstance(key, str) and self._find(key) >= 0
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        for i in range(self._count):
+            yield self._string_bytes(i).decode('utf-8')
+
+    def items(self):
+        # Walks the file once instead of searching for every key
+        for i in range(self._count):
+            yield (self._string_bytes(i).decode('utf-8'),
+                   self._string_bytes(self._values[i]).decode('utf-8'))
+
+    def close(self):
+        # Every view into the map has to go before the map can close
+        for name in ('_offsets', '_values', '_view'):
+            view = self.__dict__.pop(name, None)
+            if view is not None:
+                view.release()
+        self._mmap.close()
+
+
+class OverlayCache(Mapping):
+    """A compiled cache with a small dict of newer entries on top.
+
+    Reads check the overlay first. Writes (update / item assignment) only
+    ever touch the overlay, which is what gets journaled to disk.
+    """
+
+    def __init__(self, base, overlay=None):
+        self.base = base
+        self.overlay = overlay if overlay is not None else {}
+
+    def __getitem__(self, key):
+        try:
+            return self.overlay[key]
+        except KeyError:
+            return self.base[key]
+
+    def get(self, key, default=None):
+        value = self.overlay.get(key)
+        if value is None:
+            value = self.base.get(key, default)
+        return value
+
+    def __contains__(self, key):
+        return key in self.overlay or key in self.base
+
+    def __len__(self):
+        return len(self.base) + sum(1 for key in self.overlay if key not in self.base)
+
+    def __iter__(self):
+        yield from self.overlay
+        for key in self.base:
+            if key not in self.overlay:
+                yield key
+
+    def items(self):
+        yield from self.overlay.items()
+        for key, value in self.base.items():
+            if key not in self.overlay:
+                yield key, value
+
+    def __setitem__(self, key, value):
+        self.overlay[key] = value
+
+    def update(self, entries):
+        self.overlay.update(entries)
+
+
+def compile_cache(cache, path):
+    """Write a cache dict to path in the compiled format (atomically)"""
+    keys = sorted(key.encode('utf-8') for key in cache)
+    strings = list(keys)
+    ids = {key: i for i, key in enumerate(keys)}  # keys are unique, so ids are their positions
+
+    values = []
+    for key in keys:
+        value = cache[key.decode('utf-8')].encode('utf-8')
+        string_id = ids.get(value)
+        if string_id is None:
+            string_id = ids[value] = len(strings)
+            strings.append(value)
+        values.append(string_id)
+
+    offsets = [0]
+    for s in strings:
+        offsets.append(offsets[-1] + len(s))
+    if offsets[-1] >= 2 ** 32:
+        raise ValueError("cache too large for the compiled format")
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(keys), len(strings), offsets[-1]))
+        f.write(struct.pack(f'<{len(offsets)}I', *offsets))
+        f.write(struct.pack(f'<{len(values)}I', *values))
+        for s in strings:
+            f.write(s)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return len(keys), len(strings)
+
+
+def main():
+    from cache_store import LEGACY_CACHE_FILENAME, JournaledCacheStore
+    from key_normalizer import migrate_cache
+
+    parser = argparse.ArgumentParser(
+        description="Compile the element cache into a memory-mapped file. Entries from an "
+                    "existing compiled file, the journal and element_cache.json are merged.")
+    parser.add_argument('--base-path', default='element_cache', help="Journal to fold in")
+    parser.add_argument('--legacy', default=LEGACY_CACHE_FILENAME, help="JSON cache imported if there is no journal")
+    parser.add_argument('--out', default=COMPILED_CACHE_FILENAME)
+    parser.add_argument('--keep-journal', action='store_true',
+                        help="Leave the journal as is instead of emptying it once its entries are compiled")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    cache = {}
+    if os.path.exists(args.out):
+        compiled = CompiledCache(args.out)
+        cache.update(compiled.items())
+        compiled.close()
+
+    store = JournaledCacheStore(base_path=args.base_path, legacy_path=args.legacy)
+    cache.update(store.load())
+    cache, collisions = migrate_cache(cache)
+
+    key_count, string_count = compile_cache(cache, args.out)
+    print(f"Compiled {key_count} entries ({string_count} distinct strings) into {args.out} "
+          f"in {time.perf_counter() - started:.2f}s, {os.path.getsize(args.out)} bytes")
+    if collisions:
+        print(f"{len(collisions)} keys merged while re-keying")
+
+    if not args.keep_journal:
+        # Everything in the journal now lives in the compiled file
+        store.replace_all({})
+    store.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,184 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import game_logic
+from recipe_graph import RecipeGraph
+
+CHECKPOINT_FILENAME = 'crawler_checkpoint.json'
+UNKNOWN_RESULT = "❓Unknown"
+
+
+class RecipeCrawler:
+    """Breadth-first expansion of the combination space to pre-warm the cache.
+
+    Depth 0 is the base set; depth d holds everything first discovered by
+    combining an element from depth d-1 with anything known so far. Pairs
+    already in the cache cost nothing, so re-running the crawler simply
+    walks back through the cached levels and continues where it stopped.
+    """
+
+    def __init__(self, combiner, max_depth=3, budget=500, concurrency=4,
+                 batch_size=game_logic.MAX_BATCH_SIZE, checkpoint_every=100,
+                 checkpoint_path=CHECKPOINT_FILENAME):
+        self.combiner = combiner
+        self.max_depth = max_depth
+        self.budget = budget
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.checkpoint_every = checkpoint_every
+        self.checkpoint_path = checkpoint_path
+
+        self.known = {}  # canonical name -> display name
+        # Kept current through the combiner's listener hook
+        self.graph = RecipeGraph.from_cache(combiner.cache)
+        combiner.listeners.append(self.graph.add_entries)
+        self.depth = 0
+        self.pairs_done = 0
+        self.cache_hits = 0
+        self.started = None
+        self._calls_at_start = 0
+        self._last_checkpoint_calls = 0
+
+    @property
+    def calls_spent(self):
+        return self.combiner.api_calls - self._calls_at_start
+
+    def run(self, base_elements=game_logic.BASE_ELEMENTS):
+        self.started = time.monotonic()
+        self._calls_at_start = self.combiner.api_calls
+        # A batch whose reply is unusable falls back to one call per pair,
+        # so the budget is enforced on every model call, not per batch
+        previous_cap = self.combiner.max_api_calls
+        self.combiner.max_api_calls = self._calls_at_start + self.budget
+
+        frontier = self._add_elements(base_elements)
+        try:
+            with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+                while frontier and self.depth < self.max_depth and not self._over_budget():
+                    self.depth += 1
+                    pairs = self._pairs_for(frontier)
+                    print(f"Depth {self.depth}: {len(frontier)} new elements, {len(pairs)} pairs")
+                    results = self._resolve(pool, pairs)
+                    frontier = self._add_elements(results)
+        finally:
+            self.combiner.max_api_calls = previous_cap
+
+        self.checkpoint()
+        self.report()
+
+    def _add_elements(self, names):
+        """Record names not seen before and return them as the next frontier"""
+        new = []
+        for name in names:
+            if name == UNKNOWN_RESULT:
+                continue
+            canonical = self.combiner.normalizer.canonical_name(name)
+            if canonical and canonical not in self.known:
+                self.known[canonical] = name
+                new.append(name)
+        return new
+
+    def _pairs_for(self, frontier):
+        """Every unordered pair with at least one element from the frontier"""
+        pairs = {}
+        # Least explored elements first, so a tight budget goes where it
+        # discovers the most
+        for name in sorted(frontier, key=self.graph.use_count):
+            for other in self.known.values():
+                key = self.combiner.make_cache_key(name, other)
+                pairs.setdefault(key, (name, other))
+        return list(pairs.values())
+
+    def _resolve(self, pool, pairs):
+        # Cached pairs are answered inline; only misses are worth a batch slot
+        results = []
+        misses = []
+        for pair in pairs:
+            cached = self.combiner.cache.get(self.combiner.make_cache_key(*pair))
+            if cached is not None:
+                results.append(cached)
+                self.cache_hits += 1
+                self.pairs_done += 1
+            else:
+                misses.append(pair)
+
+        chunks = [misses[i:i + self.batch_size] for i in range(0, len(misses), self.batch_size)]
+        while chunks and not self._over_budget():
+            # Each chunk costs at least one call, so never start more than
+            # remain; the combiner's cap stops any fallbacks past the budget
+            width = min(self.concurrency, self.budget - self.calls_spent)
+            window, chunks = chunks[:width], chunks[width:]
+            for chunk_results in pool.map(self.combiner.combine_many, window):
+                results.extend(chunk_results.values())
+                # Pairs cut off by the budget come back unknown and uncached
+                self.pairs_done += sum(1 for result in chunk_results.values() if result != UNKNOWN_RESULT)
+
+            if self.calls_spent - self._last_checkpoint_calls >= self.checkpoint_every:
+                self.checkpoint()
+                self.report()
+        return results
+
+    def _over_budget(self):
+        return self.calls_spent >= self.budget
+
+    def checkpoint(self):
+        """Compact the cache journal and record how far the crawl got"""
+        self._last_checkpoint_calls = self.calls_spent
+        self.combiner.save_cache()
+        state = {
+            "depth": self.depth,
+            "known_elements": len(self.known),
+            "cache_entries": len(self.combiner.cache),
+            "pairs_done": self.pairs_done,
+            "calls_spent": self.calls_spent,
+            "timestamp": time.time(),
+        }
+        tmp_path = self.checkpoint_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def report(self):
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        hit_rate = self.cache_hits / self.pairs_done if self.pairs_done else 0.0
+        print(f"[depth {self.depth}] {self.pairs_done} pairs in {elapsed:.1f}s "
+              f"({self.pairs_done / elapsed:.1f} pairs/sec), hit rate {hit_rate:.1%}, "
+              f"{self.calls_spent}/{self.budget} calls, {len(self.known)} elements known")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-warm the element cache by crawling combinations")
+    parser.add_argument('--api-key', default=os.environ.get('GEMINI_API_KEY'),
+                        help="Gemini API key (defaults to $GEMINI_API_KEY)")
+    parser.add_argument('--depth', type=int, default=3, help="How many combination levels to expand")
+    parser.add_argument('--budget', type=int, default=500, help="Maximum number of API calls")
+    parser.add_argument('--concurrency', type=int, default=4, help="Batches in flight at once")
+    parser.add_argument('--batch-size', type=int, default=game_logic.MAX_BATCH_SIZE)
+    parser.add_argument('--checkpoint-every', type=int, default=100,
+                        help="Compact the cache and write a checkpoint every N API calls")
+    args = parser.parse_args()
+
+    if not args.api_key:
+        parser.error("an API key is required (--api-key or $GEMINI_API_KEY)")
+
+    combiner = game_logic.ElementCombiner(api_key=args.api_key,
+                                          max_workers=args.concurrency,
+                                          max_concurrent_calls=args.concurrency)
+    crawler = RecipeCrawler(combiner, max_depth=args.depth, budget=args.budget,
+                            concurrency=args.concurrency, batch_size=args.batch_size,
+                            checkpoint_every=args.checkpoint_every)
+    try:
+        crawler.run()
+    except KeyboardInterrupt:
+        print("Interrupted, saving checkpoint")
+        crawler.checkpoint()
+        crawler.report()
+    finally:
+        combiner.shutdown(wait=True)
+
+
+if __name__ == '__main__':
+    main()
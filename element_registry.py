@@ -0,0 +1,121 @@
+import re
+import threading
+
+from key_normalizer import EMOJI_PATTERN, default_normalizer
+
+# Real answers are a word or three; anything longer is the model rambling
+MAX_NAME_LENGTH = 40
+MAX_NAME_WORDS = 5
+
+# "1. ", "Output: ", "Result - " and similar in front of the answer; a
+# dash only ends a label with space around it, so "Result-Driven Design" stays
+_PREFIX_PATTERN = re.compile(r"^(?:\d+[.)]\s*)?(?:(?:output|result|answer|element)(?:\s*:|\s+[-–—]\s))?\s*",
+                             re.IGNORECASE)
+# "Fire + Water = 💨Steam"; the answer is whatever follows the last arrow or
+# equals sign after a "+", so "E=mc²" is left whole
+_ARROW_PATTERN = re.compile(r".*\+.*(?:=|->|→)\s*")
+_WRAPPERS = "\"'`*_“”‘’«» "
+# Bold, italics and inline code anywhere in the line ("**Output:** 💨Steam");
+# underscores inside a word are kept
+_MARKDOWN_PATTERN = re.compile(r"[*`]+|(?<!\w)_+|_+(?!\w)")
+# Sentence punctuation left inside a name means the reply was prose
+# (full stops are allowed for "St. Elmo's Fire")
+_PROSE_PATTERN = re.compile(r"[!?:;]\s")
+
+
+class InvalidElementName(ValueError):
+    """A model reply that no element name could be recovered from"""
+
+
+def clean_element_name(text):
+    """The element name in a model reply, repaired where possible, or None.
+
+    Each line is tried in turn and the first one that cleans up into a name
+    wins, so chatter, a bare "Output:" or a code fence around the answer is
+    skipped. Cleaning drops markdown, labels, numbering, quotes and trailing
+    punctuation, and joins "🔥 Fire" into "🔥Fire" as the prompt asks. Lines
+    that leave no letters, read like a sentence, are too long, bury an emoji
+    mid-text ("The answer is 💨Steam") or contain "+" (which would break
+    cache keys) are rejected.
+    """
+    for line in text.splitlines():
+        name = _clean_line(line)
+        if name is not None:
+            return name
+    return None
+
+
+def _clean_line(line):
+    line = line.strip()
+    if line.startswith("```"):
+        return None  # fence, possibly with a language tag
+    line = _MARKDOWN_PATTERN.sub('', line).strip()
+    # A trailing colon introduces the answer on a later line
+    if not line or line.endswith(':') or line.lower().startswith("input:"):
+        return None
+
+    name = _PREFIX_PATTERN.sub('', _ARROW_PATTERN.sub('', line))
+    name = name.strip(_WRAPPERS).rstrip(".!,;:").strip(_WRAPPERS)
+    emoji = EMOJI_PATTERN.match(name)
+    if emoji:
+        name = emoji.group(0) + name[emoji.end():].lstrip(_WRAPPERS)
+    else:
+        # Text, then an emoji, then more text is a sentence around the answer
+        emoji = EMOJI_PATTERN.search(name)
+        if emoji and name[emoji.end():].strip():
+            return None
+
+    if not name or len(name) > MAX_NAME_LENGTH or '+' in name:
+        return None
+    if len(name.split()) > MAX_NAME_WORDS or _PROSE_PATTERN.search(name):
+        return None
+    if not default_normalizer.canonical_name(name):
+        return None  # emoji only, or nothing left at all
+    return name
+
+
+class ElementRegistry:
+    """One integer id per distinct element, whatever emoji or spelling it came with.
+
+    Names are grouped by KeyNormalizer.canonical_name, the same form cache
+    keys are built from, so "🌊Lake", "🏞️Lake" and "lake" are one element.
+    display() is the preferred form: the first one registered, replaced
+    once by a form with an emoji if the first had none.
+    """
+
+    def __init__(self, normalizer=default_normalizer):
+        self.normalizer = normalizer
+        self._ids = {}      # canonical name -> id
+        self._display = []  # id -> preferred display form
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._display)
+
+    def __contains__(self, name):
+        return self.normalizer.canonical_name(name) in self._ids
+
+    def register(self, name):
+        """The id for name, assigning the next one if the element is new"""
+        canonical = self.normalizer.canonical_name(name)
+        with self._lock:
+            element_id = self._ids.get(canonical)
+            if element_id is None:
+                element_id = self._ids[canonical] = len(self._display)
+                self._display.append(name)
+            elif not EMOJI_PATTERN.match(self._display[element_id]) and EMOJI_PATTERN.match(name):
+                self._display[element_id] = name
+            return element_id
+
+    def id_of(self, name):
+        return self._ids.get(self.normalizer.canonical_name(name))
+
+    def display(self, element_id):
+        return self._display[element_id]
+
+    def preferred(self, name):
+        """The display form of the element name belongs to, registering it if needed"""
+        return self._display[self.register(name)]
+
+
+default_registry = ElementRegistry()
@@ -0,0 +1,666 @@
+import logging
+import time
+from collections import deque
+
+import pygame
+
+from canvas import Canvas
+from element_registry import default_registry
+from game_logic import BASE_ELEMENTS
+from profiler import default_profiler
+from rendering import BackgroundCache, DirtyRegions, LabelCache, ProfilerOverlay
+from sidebar import SidebarModel
+
+log = logging.getLogger(__name__)
+
+# Screen setup
+SCREEN_WIDTH, SCREEN_HEIGHT = 800, 600
+
+# Frame pacing for dirty-rect rendering; full redraws always run at ACTIVE_FPS
+ACTIVE_FPS = 60
+IDLE_FPS = 10
+IDLE_AFTER = 1000  # milliseconds without input or animation
+
+# Colors and styles
+WHITE = (255, 255, 255)
+DARK = (30, 30, 30)
+LIGHT = (240, 240, 240)
+BLACK = (0, 0, 0)
+HOVER_COLOR = (220, 220, 220)
+BG_TOP = (100, 0, 150)
+BG_BOTTOM = (25, 0, 75)
+SCROLLBAR_COLOR = (150, 150, 150)
+SCROLLBAR_HOVER_COLOR = (120, 120, 120)
+PENDING_COLOR = (200, 200, 230)
+
+# Label shown on a canvas element while its combination is still in flight
+PENDING_LABEL = "⏳..."
+
+# Double click settings
+DOUBLE_CLICK_TIME = 500  # milliseconds
+
+# UI dimensions
+SIDEBAR_WIDTH = 250
+SIDEBAR_PADDING = 20
+SCROLLBAR_WIDTH = 15
+
+# Smaller element dimensions
+ELEMENT_HEIGHT = 45  # Reduced from 60
+ELEMENT_MARGIN = 8   # Reduced from 10
+
+
+# Double-click handler class
+class DoubleClickHandler:
+    def __init__(self, double_click_time=500):
+        self.double_click_time = double_click_time
+        self.last_click_time = 0
+        self.last_click_pos = (0, 0)
+        self.click_tolerance = 10
+        self.first_click_handled = False
+
+    def check_double_click(self, current_time, mouse_pos):
+        """Check if this is a double click and return True if so"""
+        time_diff = current_time - self.last_click_time
+
+        if time_diff < self.double_click_time:
+            # Check position tolerance
+            pos_diff = ((mouse_pos[0] - self.last_click_pos[0])**2 +
+                       (mouse_pos[1] - self.last_click_pos[1])**2)**0.5
+
+            if pos_diff < self.click_tolerance:
+                # This is a double click
+                self.last_click_time = 0  # Reset to prevent triple clicks
+                return True
+
+        # Update for next potential double click
+        self.last_click_time = current_time
+        self.last_click_pos = mouse_pos
+        return False
+
+def duplicate_canvas_element(original_element, canvas_elements, screen_width, screen_height):
+    """Duplicate a canvas element and find a safe position for it"""
+    # Calculate new position with offset
+    offset_x = 60
+    offset_y = 20
+
+    new_x = original_element["rect"].x + offset_x
+    new_y = original_element["rect"].y + offset_y
+
+    # Keep within screen bounds
+    element_width = original_element["rect"].width
+    element_height = original_element["rect"].height
+
+    # Check right boundary
+    if new_x + element_width > screen_width:
+        new_x = original_element["rect"].x - offset_x
+
+    # Check bottom boundary
+    if new_y + element_height > screen_height:
+        new_y = original_element["rect"].y - offset_y
+
+    # Check left boundary
+    if new_x < 0:
+        new_x = original_element["rect"].x + offset_x
+
+    # Check top boundary
+    if new_y < 0:
+        new_y = original_element["rect"].y + offset_y
+
+    # Create the duplicate
+    duplicate = {
+        "element": {"name": original_element["element"]["name"]},
+        "rect": pygame.Rect(new_x, new_y, element_width, element_height)
+    }
+    # A copy of a still-resolving element resolves along with the original
+    if "pending" in original_element:
+        duplicate["pending"] = original_element["pending"]
+        duplicate["pair"] = original_element["pair"]
+
+    canvas_elements.add(duplicate)
+    return duplicate
+
+def load_fonts():
+    """(font, title_font), falling back to pygame's default font"""
+    try:
+        font = pygame.font.SysFont("Segoe UI Emoji", 20)  # Smaller font
+        title_font = pygame.font.SysFont("Segoe UI Emoji", 24, bold=True)  # Smaller title font
+    except:
+        font = pygame.font.Font(None, 20)
+        title_font = pygame.font.Font(None, 24)
+    return font, title_font
+
+
+class Game:
+    """One play session: every piece of UI state plus the per-frame step.
+
+    step() applies a frame's input events at time now (milliseconds) and
+    draws onto screen. It never reads the real mouse, clock or display, so
+    the same session runs in a window or headless under SDL's dummy video
+    driver, and a recorded event trace replays the same way every time.
+    """
+
+    def __init__(self, screen, combiner, prefetcher=None, sounds=None, fonts=None,
+                 dirty_rendering=True, profiler=None, registry=None):
+        self.screen = screen
+        self.combiner = combiner
+        self.prefetcher = prefetcher
+        self.sounds = sounds if sounds is not None else {}  # may still be filling in
+        self.font, self.title_font = fonts or load_fonts()
+        self.running = True
+
+        # Redraw only what changed and slow down when idle (F3 toggles)
+        self.dirty_rendering = dirty_rendering
+        self.dirty = DirtyRegions(screen.get_rect())
+
+        # Timing spans around each phase of step(); F2 shows them on screen
+        self.profiler = profiler or default_profiler
+        self.profiler_overlay = None  # created the first time it is shown
+        self.show_profiler = False
+
+        # Rendered element names, reused across frames
+        self.label_cache = LabelCache(profiler=self.profiler)
+        # The gradient is rendered once and re-rendered only when the theme or size changes
+        self.background_cache = BackgroundCache(profiler=self.profiler)
+        self.double_click_handler = DoubleClickHandler(DOUBLE_CLICK_TIME)
+
+        # UI dimensions
+        width, height = screen.get_size()
+        self.is_light_mode = True
+        self.mode_button_rect = pygame.Rect(20, 20, 180, 50)
+        self.sidebar_rect = pygame.Rect(width - SIDEBAR_WIDTH - SIDEBAR_PADDING, SIDEBAR_PADDING,
+                                        SIDEBAR_WIDTH, height - SIDEBAR_PADDING * 2)
+        self.scrollbar_rect = pygame.Rect(self.sidebar_rect.right - SCROLLBAR_WIDTH - 5, self.sidebar_rect.y + 60,
+                                          SCROLLBAR_WIDTH, self.sidebar_rect.height - 70)
+
+        # Element definitions; the sidebar holds one row per registry id
+        self.registry = registry or default_registry
+        elements = [{"name": self.registry.preferred(name)} for name in BASE_ELEMENTS]
+        self.discovered = set(self.registry.register(el["name"]) for el in elements)
+        # Only the rows inside the sidebar viewport are ever laid out or drawn
+        self.sidebar = SidebarModel(elements, ELEMENT_HEIGHT, ELEMENT_MARGIN, self.sidebar_rect.height - 70)
+        self.scroll_offset = 0
+        self.max_scroll = 0
+
+        # Scrolling variables
+        self.scrolling = False
+        self.scroll_start_y = 0
+
+        # Track newly duplicated elements (by id) for visual effect
+        self.newly_duplicated = set()
+        self.duplicate_effect_timer = 0
+
+        self.dragging_element = None
+        self.drag_offset = (0, 0)
+        # Spatially indexed, so picking and drop tests only look at nearby elements
+        self.canvas_elements = Canvas()
+        self.mouse_pos = (0, 0)
+
+        # State behind the last presented frame, used to detect what changed
+        self.last_sidebar_state = None
+        self.last_drag_rect = None
+        self.last_activity_time = 0
+        self.last_step_time = None
+
+        # Seconds from drop to result for recent combinations
+        self.combine_latencies = deque(maxlen=100_000)
+
+        self.calculate_max_scroll()
+
+    # Sidebar
+
+    def calculate_max_scroll(self):
+        self.max_scroll = self.sidebar.max_scroll()
+        self.scroll_offset = max(0, min(self.scroll_offset, self.max_scroll))
+
+    def get_element_rects(self):
+        """(row, rect) for the sidebar rows currently inside the viewport"""
+        top = self.sidebar_rect.y + 60  # Account for title space
+        return [(row, pygame.Rect(
+                    self.sidebar_rect.x + 15,
+                    top + int(y),
+                    SIDEBAR_WIDTH - 40,  # Account for scrollbar space
+                    ELEMENT_HEIGHT))
+                for row, y in self.sidebar.visible_rows(self.scroll_offset)]
+
+    def set_sidebar_filter(self, query):
+        self.sidebar.set_query(query)
+        self.scroll_offset = 0
+        self.calculate_max_scroll()
+
+    def get_scrollbar_thumb_rect(self):
+        if self.max_scroll <= 0:
+            return None
+
+        visible_height = self.sidebar_rect.height - 70
+        thumb_height = max(20, int(visible_height * visible_height / self.sidebar.content_height()))
+        thumb_y = self.scrollbar_rect.y + int((self.scroll_offset / self.max_scroll) * (self.scrollbar_rect.height - thumb_height))
+
+        return pygame.Rect(self.scrollbar_rect.x, thumb_y, SCROLLBAR_WIDTH, thumb_height)
+
+    def handle_scroll(self, mouse_pos, scroll_direction):
+        if self.sidebar_rect.collidepoint(mouse_pos):
+            scroll_speed = 30  # Pixels per scroll
+            self.scroll_offset += scroll_direction * scroll_speed
+            self.scroll_offset = max(0, min(self.scroll_offset, self.max_scroll))
+
+    def add_discovered_element(self, name):
+        element_id = self.registry.register(name)
+        if element_id not in self.discovered:
+            self.sidebar.add({"name": self.registry.display(element_id)})
+            self.discovered.add(element_id)
+            self.calculate_max_scroll()  # Recalculate scroll limits
+
+    # Canvas
+
+    def mark_element(self, elem):
+        """Queue a canvas element's area (including its glow) for redraw"""
+        self.dirty.mark(elem["rect"].inflate(4, 4))
+
+    def resolve_pending_elements(self):
+        """Swap finished combinations into their placeholder canvas elements"""
+        candidates = list(self.canvas_elements)
+        if self.dragging_element:
+            candidates.append(self.dragging_element)
+
+        for elem in candidates:
+            future = elem.get("pending")
+            if future is None or not future.done():
+                continue
+            try:
+                combined_name = future.result()
+            except Exception as e:
+                log.warning("Combination failed: %s", e)
+                combined_name = "❓Unknown"
+            # Older cache entries may spell an element differently
+            combined_name = self.registry.preferred(combined_name)
+            del elem["pending"]
+            elem.pop("pair", None)
+            if "submitted" in elem:
+                self.combine_latencies.append(time.perf_counter() - elem.pop("submitted"))
+            elem["element"] = {"name": combined_name}
+            if elem is not self.dragging_element:
+                self.canvas_elements.touch(elem)
+            self.mark_element(elem)
+            self.add_discovered_element(combined_name)
+            if elem is not self.dragging_element:
+                self.focus_prefetch(combined_name, elem["rect"])
+
+    def focus_prefetch(self, name, rect):
+        # Warms the cache for the pairs a dragged or placed element is likely to form
+        if self.prefetcher:
+            self.prefetcher.focus(name, rect, self.canvas_elements)
+
+    def play(self, sound):
+        if sound in self.sounds:
+            self.sounds[sound].play()
+
+    # Frame
+
+    def has_pending(self):
+        return (bool(self.dragging_element and "pending" in self.dragging_element)
+                or any("pending" in elem for elem in self.canvas_elements))
+
+    def target_fps(self, now):
+        """Tick rate for the next frame: throttled once the session goes idle.
+
+        A combination still in flight keeps the session active, so its result
+        is swapped in the frame it arrives rather than up to an idle tick late.
+        """
+        if (self.dirty_rendering and now - self.last_activity_time > IDLE_AFTER
+                and not self.has_pending()):
+            return IDLE_FPS
+        return ACTIVE_FPS
+
+    def step(self, events, now):
+        """Advance one frame and draw it.
+
+        Returns the rects to pass to display.update(), an empty list when
+        nothing needs presenting, or None when the whole screen should be
+        flipped.
+        """
+        profiler = self.profiler
+        dt = 0 if self.last_step_time is None else now - self.last_step_time
+        self.last_step_time = now
+        with profiler.span("resolve_pending"):
+            self.resolve_pending_elements()
+
+        # Update duplicate effect timer
+        if self.newly_duplicated:
+            self.duplicate_effect_timer += dt
+            if self.duplicate_effect_timer > 1000:  # Effect lasts 1 second
+                for elem_id in self.newly_duplicated:
+                    if self.canvas_elements.get(elem_id):
+                        self.mark_element(self.canvas_elements.get(elem_id))
+                self.newly_duplicated.clear()
+                self.duplicate_effect_timer = 0
+
+        with profiler.span("events"):
+            for event in events:
+                self.handle_event(event, now)
+
+        update_rects = self.draw()
+        if events or self.dragging_element or self.newly_duplicated or update_rects:
+            self.last_activity_time = now
+        if self.show_profiler:
+            # Refreshing the numbers alone doesn't count as activity
+            update_rects = self.draw_profiler(now, update_rects)
+        return update_rects
+
+    def toggle_profiler(self):
+        self.show_profiler = not self.show_profiler
+        if self.show_profiler:
+            if self.profiler_overlay is None:
+                self.profiler_overlay = ProfilerOverlay(self.profiler, pygame.font.SysFont("monospace", 14))
+            self.profiler.enabled = True
+        else:
+            # Keep timing while a trace file is being written
+            self.profiler.enabled = self.profiler.tracing
+            self.dirty.mark(self.profiler_overlay.rect)
+
+    def profiler_lines(self):
+        """Cache and request counters shown under the timings"""
+        pending = sum(1 for elem in self.canvas_elements if "pending" in elem)
+        line = f"pending {pending}"
+        stats = getattr(self.combiner, "stats", None)  # CombineClient has none
+        if stats:
+            stats = stats()
+            line = (f"cache hit {stats['hit_rate']:.0%}  in flight {stats['in_flight']}  "
+                    f"{line}")
+        return [line]
+
+    def draw_profiler(self, now, update_rects):
+        overlay = self.profiler_overlay
+        due = overlay.due(now)
+        if update_rects == [] and not due:
+            return update_rects
+        with self.profiler.span("overlay"):
+            if due:
+                overlay.update(now, self.profiler_lines())
+            rect = overlay.draw(self.screen)
+        return None if update_rects is None else update_rects + [rect]
+
+    def handle_event(self, event, now):
+        if hasattr(event, "pos"):
+            self.mouse_pos = event.pos
+        mouse_pos = self.mouse_pos
+
+        if event.type == pygame.QUIT:
+            self.running = False
+
+        elif event.type == pygame.VIDEOEXPOSE:
+            self.dirty.mark_all()
+
+        elif event.type == pygame.MOUSEWHEEL:
+            self.handle_scroll(mouse_pos, -event.y)
+
+        # Typing filters the sidebar; Backspace edits, Escape clears
+        elif event.type == pygame.TEXTINPUT:
+            self.set_sidebar_filter(self.sidebar.query + event.text)
+
+        elif event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_F3:
+                self.dirty_rendering = not self.dirty_rendering
+                self.dirty.mark_all()
+            elif event.key == pygame.K_F2:
+                self.toggle_profiler()
+            elif event.key == pygame.K_BACKSPACE and self.sidebar.query:
+                self.set_sidebar_filter(self.sidebar.query[:-1])
+            elif event.key == pygame.K_ESCAPE and self.sidebar.query:
+                self.set_sidebar_filter("")
+
+        elif event.type == pygame.MOUSEBUTTONDOWN:
+            if event.button == 1:  # Left click
+                self.handle_press(mouse_pos, now)
+
+        elif event.type == pygame.MOUSEBUTTONUP:
+            if event.button == 1:  # Left click release
+                self.handle_release(mouse_pos)
+
+        elif event.type == pygame.MOUSEMOTION:
+            self.handle_motion(mouse_pos)
+
+    def handle_press(self, mouse_pos, now):
+        # Check for double click first
+        is_double_click = self.double_click_handler.check_double_click(now, mouse_pos)
+
+        if is_double_click:
+            # Handle double click - check if clicking on canvas element
+            double_clicked_element = self.canvas_elements.at_point(mouse_pos)
+
+            if double_clicked_element:
+                # Duplicate the element
+                width, height = self.screen.get_size()
+                duplicate = duplicate_canvas_element(double_clicked_element, self.canvas_elements, width, height)
+                self.newly_duplicated.add(duplicate["id"])
+                self.mark_element(duplicate)
+                self.duplicate_effect_timer = 0
+                log.debug("Duplicated element: %s", duplicate["element"]["name"])
+                return  # Skip normal click handling
+
+        # Normal single click handling
+        self.play("drag")
+
+        # Check mode button
+        if self.mode_button_rect.collidepoint(mouse_pos):
+            self.is_light_mode = not self.is_light_mode
+            self.dirty.mark_all()
+
+        # Check scrollbar
+        scrollbar_thumb = self.get_scrollbar_thumb_rect()
+        if scrollbar_thumb and scrollbar_thumb.collidepoint(mouse_pos):
+            self.scrolling = True
+            self.scroll_start_y = mouse_pos[1] - scrollbar_thumb.y
+
+        # Check sidebar elements
+        elif self.sidebar_rect.collidepoint(mouse_pos) and not self.scrolling:
+            for i, rect in self.get_element_rects():
+                if rect.collidepoint(mouse_pos):
+                    self.dragging_element = {
+                        "element": self.sidebar.element_at(i),
+                        "rect": pygame.Rect(mouse_pos[0], mouse_pos[1], rect.width, rect.height)
+                    }
+                    self.drag_offset = (mouse_pos[0] - rect.x, mouse_pos[1] - rect.y)
+                    break
+
+        # Check canvas elements
+        if not self.dragging_element:
+            elem = self.canvas_elements.at_point(mouse_pos)
+            if elem:
+                self.canvas_elements.remove(elem)
+                self.mark_element(elem)
+                self.dragging_element = {
+                    "id": elem["id"],
+                    "element": elem["element"],
+                    "rect": elem["rect"]
+                }
+                # Keep waiting on an in-flight combination while it's moved
+                for key in ("pending", "pair", "submitted"):
+                    if key in elem:
+                        self.dragging_element[key] = elem[key]
+                self.drag_offset = (mouse_pos[0] - elem["rect"].x, mouse_pos[1] - elem["rect"].y)
+
+    def handle_release(self, mouse_pos):
+        self.scrolling = False
+        dragging_element = self.dragging_element
+        if not dragging_element:
+            return
+        self.dragging_element = None
+
+        if self.sidebar_rect.collidepoint(mouse_pos):
+            return
+
+        # Try combining with the topmost element underneath
+        # (elements still waiting on a result can't combine yet)
+        overlapping = []
+        if "pending" not in dragging_element:
+            overlapping = self.canvas_elements.colliding(dragging_element["rect"],
+                                                         exclude=dragging_element)
+        for other in overlapping:
+            if "pending" not in other:
+                self.play("combine")
+                name1 = dragging_element["element"]["name"]
+                name2 = other["element"]["name"]
+                # Resolve in the background; the placeholder is
+                # swapped for the result by resolve_pending_elements
+                future = self.combiner.combine_async(name1, name2)
+
+                new_rect = pygame.Rect(
+                    (dragging_element["rect"].x + other["rect"].x) // 2,
+                    (dragging_element["rect"].y + other["rect"].y) // 2,
+                    dragging_element["rect"].width,
+                    dragging_element["rect"].height
+                )
+                placeholder = {
+                    "element": {"name": PENDING_LABEL},
+                    "rect": new_rect,
+                    "pending": future,
+                    "pair": (name1, name2),  # so a saved session can ask again
+                    "submitted": time.perf_counter()
+                }
+                self.canvas_elements.add(placeholder)
+                self.mark_element(placeholder)
+
+                self.canvas_elements.remove(other)
+                self.mark_element(other)
+                return
+
+        self.canvas_elements.add(dragging_element)
+        self.mark_element(dragging_element)
+        if "pending" not in dragging_element:
+            self.focus_prefetch(dragging_element["element"]["name"], dragging_element["rect"])
+
+    def handle_motion(self, mouse_pos):
+        if self.scrolling:
+            # Handle scrollbar dragging
+            scrollbar_thumb = self.get_scrollbar_thumb_rect()
+            if scrollbar_thumb and self.max_scroll > 0:
+                new_thumb_y = mouse_pos[1] - self.scroll_start_y
+                relative_pos = (new_thumb_y - self.scrollbar_rect.y) / (self.scrollbar_rect.height - scrollbar_thumb.height)
+                self.scroll_offset = max(0, min(self.max_scroll, relative_pos * self.max_scroll))
+
+        elif self.dragging_element:
+            self.dragging_element["rect"].x = mouse_pos[0] - self.drag_offset[0]
+            self.dragging_element["rect"].y = mouse_pos[1] - self.drag_offset[1]
+            if "pending" not in self.dragging_element:
+                self.focus_prefetch(self.dragging_element["element"]["name"],
+                                    self.dragging_element["rect"])
+
+    # Drawing
+
+    def draw(self):
+        """Draw whatever changed; returns what step() returns"""
+        screen = self.screen
+        mouse_pos = self.mouse_pos
+        sidebar_rect = self.sidebar_rect
+        dragging_element = self.dragging_element
+        profiler = self.profiler
+
+        # Work out what changed on screen this frame
+        with profiler.span("layout"):
+            element_rects = self.get_element_rects()
+            thumb_rect = self.get_scrollbar_thumb_rect()
+        if self.dirty_rendering:
+            hovered_row = next((i for i, rect in element_rects if rect.collidepoint(mouse_pos)), None)
+            thumb_hover = bool(thumb_rect and thumb_rect.collidepoint(mouse_pos))
+            sidebar_state = (self.scroll_offset, self.sidebar.query, len(self.sidebar),
+                             hovered_row, thumb_hover, self.scrolling)
+            if sidebar_state != self.last_sidebar_state:
+                self.dirty.mark(sidebar_rect)
+                self.last_sidebar_state = sidebar_state
+
+            drag_rect = dragging_element["rect"].copy() if dragging_element else None
+            if drag_rect != self.last_drag_rect:
+                self.dirty.mark(self.last_drag_rect, drag_rect)
+                self.last_drag_rect = drag_rect
+
+            update_rects = self.dirty.take() if self.dirty else []
+            if not update_rects:
+                return update_rects  # nothing changed; skip drawing entirely
+            frame_clip = update_rects[0].unionall(update_rects[1:])
+        else:
+            self.dirty.take()
+            update_rects = None
+            frame_clip = screen.get_rect()
+
+        screen.set_clip(frame_clip)
+        with profiler.span("background"):
+            background = self.background_cache.get(screen.get_size(), BG_TOP, BG_BOTTOM, self.is_light_mode)
+            screen.blit(background, (0, 0))
+
+        if frame_clip.colliderect(sidebar_rect):
+            with profiler.span("sidebar"):
+                self.draw_sidebar(element_rects, thumb_rect, frame_clip)
+
+        # Draw canvas elements with duplicate effect, bottom to top
+        with profiler.span("canvas"):
+            if self.dirty_rendering:
+                visible = reversed(self.canvas_elements.colliding(frame_clip.inflate(4, 4)))
+            else:
+                visible = self.canvas_elements
+            for elem in visible:
+                is_new = elem["id"] in self.newly_duplicated
+                self.draw_canvas_element_with_effect(elem, is_new)
+
+        # Draw dragging element
+        if dragging_element:
+            rect = dragging_element["rect"]
+            bg_color = PENDING_COLOR if "pending" in dragging_element else WHITE
+            pygame.draw.rect(screen, bg_color, rect, border_radius=12)
+            self.label_cache.blit_centered(screen, self.font, dragging_element['element']['name'], BLACK, rect)
+
+        screen.set_clip(None)
+        return update_rects
+
+    def draw_sidebar(self, element_rects, thumb_rect, frame_clip):
+        screen = self.screen
+        sidebar_rect = self.sidebar_rect
+        mouse_pos = self.mouse_pos
+
+        pygame.draw.rect(screen, WHITE, sidebar_rect, border_radius=25)
+        # Draw title
+        title_surface = self.label_cache.render(self.title_font, "Elements:", BLACK)
+        screen.blit(title_surface, (sidebar_rect.x + 15, sidebar_rect.y + 20))
+        if self.sidebar.query:
+            query_surface = self.label_cache.render(self.font, f"🔍{self.sidebar.query}", BLACK)
+            screen.blit(query_surface, (sidebar_rect.x + 15 + title_surface.get_width() + 10,
+                                        sidebar_rect.y + 24))
+
+        # Create clipping rect for scrollable area
+        clip_rect = pygame.Rect(sidebar_rect.x + 10, sidebar_rect.y + 60,
+                                sidebar_rect.width - 30, sidebar_rect.height - 70)
+        screen.set_clip(clip_rect.clip(frame_clip))
+
+        # Draw elements
+        for i, rect in element_rects:
+            hover = rect.collidepoint(mouse_pos) and not self.scrolling
+            bg_color = HOVER_COLOR if hover else LIGHT
+            pygame.draw.rect(screen, bg_color, rect, border_radius=10)
+
+            self.label_cache.blit_centered(screen, self.font, self.sidebar.element_at(i)["name"], BLACK, rect)
+
+        # Back to the frame's clip
+        screen.set_clip(frame_clip)
+
+        # Draw scrollbar if needed
+        if self.max_scroll > 0:
+            # Draw scrollbar track
+            pygame.draw.rect(screen, LIGHT, self.scrollbar_rect, border_radius=7)
+
+            # Draw scrollbar thumb
+            if thumb_rect:
+                thumb_color = SCROLLBAR_HOVER_COLOR if self.scrolling or thumb_rect.collidepoint(mouse_pos) else SCROLLBAR_COLOR
+                pygame.draw.rect(screen, thumb_color, thumb_rect, border_radius=7)
+
+    def draw_canvas_element_with_effect(self, elem, is_new_duplicate=False):
+        """Draw canvas element with optional duplicate effect"""
+        screen = self.screen
+        rect = elem["rect"]
+
+        # Add a subtle glow effect for newly duplicated elements
+        if is_new_duplicate:
+            glow_rect = pygame.Rect(rect.x - 2, rect.y - 2, rect.width + 4, rect.height + 4)
+            pygame.draw.rect(screen, (255, 255, 150), glow_rect, border_radius=14)
+
+        bg_color = PENDING_COLOR if "pending" in elem else WHITE
+        pygame.draw.rect(screen, bg_color, rect, border_radius=12)
+        self.label_cache.blit_centered(screen, self.font, elem['element']['name'], BLACK, rect)
@@ -1,159 +1,472 @@
-import google.generativeai as genai
-import json
-import os
-
-CACHE_FILENAME = 'element_cache.json'
-
-class ElementCombiner:
-    def __init__(self, api_key, model_name='gemini-2.0-flash'):
-        self.api_key = api_key  # Use the passed api_key parameter
-        self.model_name = model_name
-        self.cache = {}  # Initialize as empty dict, not a set with filename
-
-        genai.configure(api_key=self.api_key)
-        self.model = genai.GenerativeModel(self.model_name)
-
-        self.load_cache()
-
-    def load_cache(self):
-        try:
-            if os.path.exists("element_cache.json"):
-                with open("element_cache.json", 'r', encoding='utf-8') as f:
-                    content = f.read().strip()
-                    if content:  # Check if file has content
-                        self.cache = json.loads(content)
-                    else:
-                        self.cache = {}
-            else:
-                self.cache = {}
-                print("Cache file not found. Starting with empty cache.")
-        except json.JSONDecodeError:
-            print("Cache file corrupted. Starting with empty cache.")
-            self.cache = {}
-        except Exception as e:
-            print(f"Error loading cache: {e}")
-            self.cache = {}
-
-    def save_cache(self):
-        try:
-            with open("element_cache.json", 'w', encoding='utf-8') as f:
-                json.dump(self.cache, f, ensure_ascii=False, indent=2)
-            print(f"Cache saved with {len(self.cache)} entries")
-        except Exception as e:
-            print(f"Error saving cache: {e}")
-
-    def make_cache_key(self, el1, el2):
-        # Remove emojis for consistent key generation
-        def clean_element(element):
-            # Remove common emojis and strip whitespace
-            import re
-            # Remove emojis using regex
-            emoji_pattern = re.compile("["
-                                       u"\U0001F600-\U0001F64F"  # emoticons
-                                       u"\U0001F300-\U0001F5FF"  # symbols & pictographs
-                                       u"\U0001F680-\U0001F6FF"  # transport & map symbols
-                                       u"\U0001F1E0-\U0001F1FF"  # flags (iOS)
-                                       u"\U00002702-\U000027B0"
-                                       u"\U000024C2-\U0001F251"
-                                       "]+", flags=re.UNICODE)
-            return emoji_pattern.sub('', element).strip()
-        
-        clean_el1 = clean_element(el1).lower()
-        clean_el2 = clean_element(el2).lower()
-        return '+'.join(sorted([clean_el1, clean_el2]))
-
-    def call_gemini_api(self, el1, el2):
-        key = self.make_cache_key(el1, el2)
-        
-        # Check cache first
-        if key in self.cache:
-            print(f"Cache hit for {el1} + {el2}: {self.cache[key]}")
-            return self.cache[key]
-
-        print(f"Cache miss for {el1} + {el2}. Calling Gemini API...")
-        
-        # Compose prompt for Gemini
-        prompt = f"""
-You are an expert in element combinations similar to Little Alchemy. When given two element names, output only the emoji followed by the element name formed by combining them.
-
-If you are not exactly sure, give the closest possible element you think fits best. Similar elements when combined can have the same outputs, so do not worry about multiple valid answers.
-
-Examples:
-Input: Fire + Water
-Output: 💨Steam
-
-Input: Earth + Air
-Output: 🌪️Dust
-
-Input: Water + Earth
-Output: 🌱Mud
-
-Make sure to Always output an emoji followed by the element name with NO SPACES between them, like this: "🔥Firestorm". Make sure the emojis are unique and make sense
-
-Reply only in English.
-
-Try to be as logical as possible and be open to creative combinations with creative products.
-
-Here are some more examples that you can learn from:
-
-"earth+earth": "🏞️Land",
-"land+land": "🗺️Continent",
-"continent+continent": "🌍Planet",
-"planet+planet": "☀️Solar System",
-"solar system+solar system": "🌌Galaxy",
-"galaxy+galaxy": "🌀Universe",
-
-"water+water": "💦Puddle",
-"puddle+puddle": "🏞️Lake",
-"lake+lake": "🌊Ocean",
-"ocean+ocean": "🌪️Pressure",
-"pressure+pressure": "🧽Deep Sea",
-"deep sea+deep sea": "🐙Abyss",
-
-"fire+fire": "🔥Energy",
-"energy+energy": "⚡Lightning",
-"lightning+fire": "💥Explosion",
-"explosion+energy": "🚀Rocket",
-"rocket+rocket": "🛰️Satellite",
-"satellite+energy": "🌠Star",
-"star+star": "🌞Sun",
-
-"air+air": "💨Wind",
-"wind+wind": "🌪️Tornado",
-"tornado+wind": "🌀Storm",
-"storm+air": "☁️Cloud",
-"cloud+cloud": "⛈️Thunderstorm",
-"thunderstorm+storm": "🌫️Atmosphere",
-"atmosphere+air": "🌈Sky",
-
-"life+life": "🧫Cell",
-"cell+cell": "🦠Organism",
-"organism+organism": "🐒Animal",
-"animal+intelligence": "🧍Human",
-"human+human": "🏘️Society",
-"society+knowledge": "🏛️Civilization",
-"civilization+time": "🚀Future"
-
-Input: {el1} + {el2}
-Output: 
-
-"""
-
-        try:
-            response = self.model.generate_content(prompt)
-            output = response.text.strip()
-            
-            # Cache the result
-            self.cache[key] = output
-            self.save_cache()
-            
-            print(f"API result for {el1} + {el2}: {output}")
-            return output
-            
-        except Exception as e:
-            print(f"Error calling Gemini API: {e}")
-            return f"❓Unknown"  # Return a default combination
-
-    def combine_elements(self, el1, el2):
-        """Alternative method name for compatibility"""
-        return self.call_gemini_api(el1, el2)
\ No newline at end of file
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from backends import GeminiBackend
+from cache_store import JournaledCacheStore
+from compiled_cache import COMPILED_CACHE_FILENAME, CompiledCache, OverlayCache
+from element_registry import InvalidElementName, clean_element_name, default_registry
+from key_normalizer import default_normalizer, migrate_cache
+from profiler import default_profiler
+from request_control import SingleFlight, TokenBucket, retry_with_backoff
+from tiered_cache import TieredCache
+
+# Per-lookup detail is logged at DEBUG and problems at WARNING; nothing
+# below WARNING is shown unless the application configures logging
+log = logging.getLogger(__name__)
+
+CACHE_FILENAME = 'element_cache.json'
+
+# Every game (and the crawler) starts from these
+BASE_ELEMENTS = ["🔥Fire", "💧Water", "🌍Earth", "💨Air"]
+
+# Pairs packed into a single batched prompt
+MAX_BATCH_SIZE = 20
+
+
+class CallBudgetExhausted(RuntimeError):
+    """max_api_calls model requests have been made; no more will be"""
+
+PROMPT_INSTRUCTIONS = """
+You are an expert in element combinations similar to Little Alchemy. When given two element names, output only the emoji followed by the element name formed by combining them.
+
+If you are not exactly sure, give the closest possible element you think fits best. Similar elements when combined can have the same outputs, so do not worry about multiple valid answers.
+
+Examples:
+Input: Fire + Water
+Output: 💨Steam
+
+Input: Earth + Air
+Output: 🌪️Dust
+
+Input: Water + Earth
+Output: 🌱Mud
+
+Make sure to Always output an emoji followed by the element name with NO SPACES between them, like this: "🔥Firestorm". Make sure the emojis are unique and make sense
+
+Reply only in English.
+
+Try to be as logical as possible and be open to creative combinations with creative products.
+
+Here are some more examples that you can learn from:
+
+"earth+earth": "🏞️Land",
+"land+land": "🗺️Continent",
+"continent+continent": "🌍Planet",
+"planet+planet": "☀️Solar System",
+"solar system+solar system": "🌌Galaxy",
+"galaxy+galaxy": "🌀Universe",
+
+"water+water": "💦Puddle",
+"puddle+puddle": "🏞️Lake",
+"lake+lake": "🌊Ocean",
+"ocean+ocean": "🌪️Pressure",
+"pressure+pressure": "🧽Deep Sea",
+"deep sea+deep sea": "🐙Abyss",
+
+"fire+fire": "🔥Energy",
+"energy+energy": "⚡Lightning",
+"lightning+fire": "💥Explosion",
+"explosion+energy": "🚀Rocket",
+"rocket+rocket": "🛰️Satellite",
+"satellite+energy": "🌠Star",
+"star+star": "🌞Sun",
+
+"air+air": "💨Wind",
+"wind+wind": "🌪️Tornado",
+"tornado+wind": "🌀Storm",
+"storm+air": "☁️Cloud",
+"cloud+cloud": "⛈️Thunderstorm",
+"thunderstorm+storm": "🌫️Atmosphere",
+"atmosphere+air": "🌈Sky",
+
+"life+life": "🧫Cell",
+"cell+cell": "🦠Organism",
+"organism+organism": "🐒Animal",
+"animal+intelligence": "🧍Human",
+"human+human": "🏘️Society",
+"society+knowledge": "🏛️Civilization",
+"civilization+time": "🚀Future"
+
+"""
+
+class ElementCombiner:
+    def __init__(self, api_key=None, model_name='gemini-2.0-flash', max_workers=4,
+                 max_concurrent_calls=4, calls_per_second=5.0, burst=5, max_retries=3,
+                 backend=None, store=None, defer_load=False, compiled_path=COMPILED_CACHE_FILENAME,
+                 hot_entries=10000, hot_bytes=None):
+        self.api_key = api_key  # Use the passed api_key parameter
+        self.model_name = model_name
+        # Recently used results in a bounded LRU in front of a compiled
+        # cache; without one everything is in memory and there is no hot tier
+        self.hot_entries = hot_entries
+        self.hot_bytes = hot_bytes
+        self.cache = TieredCache({}, 0)
+
+        # Guards self.cache and the cache file, since combinations can now
+        # resolve on worker threads while the game loop keeps reading
+        self._lock = threading.RLock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix="combiner")
+        self.normalizer = default_normalizer
+        # New results are stored in their element's preferred display form
+        self.registry = default_registry
+        # Timing spans for the overlay and trace files; free while disabled
+        self.profiler = default_profiler
+
+        # Every model call goes through one shared set of limits: identical
+        # pairs share a single call, at most max_concurrent_calls run at once
+        # and calls are paced by a token bucket to stay within quota
+        self._inflight = SingleFlight()
+        self._call_slots = threading.BoundedSemaphore(max_concurrent_calls)
+        self._rate_limiter = TokenBucket(calls_per_second, burst)
+        self.max_retries = max_retries
+        self.api_calls = 0  # model requests made, including retries
+        # Hard cap on api_calls, e.g. the crawler's budget; None for no cap
+        self.max_api_calls = None
+        self.api_errors = 0
+        self.invalid_responses = 0  # replies no element name could be recovered from
+        self.api_seconds = 0.0
+        self.api_latencies = deque(maxlen=1000)  # most recent, for percentiles
+        self.bytes_sent = 0      # prompt text, UTF-8
+        self.bytes_received = 0  # reply text, UTF-8
+        # Callables given each batch of new cache entries (e.g. RecipeGraph.add_entries)
+        self.listeners = []
+
+        # A compiled cache (python compiled_cache.py) is mapped read-only and
+        # the journal only holds what was discovered since it was built
+        self.compiled_path = compiled_path if compiled_path and os.path.exists(compiled_path) else None
+        self._compiled = None  # its CompiledCache once loaded; shutdown() closes it
+
+        # Journaled storage; imports CACHE_FILENAME the first time it runs,
+        # unless its entries already live in a compiled cache
+        self.store = store or JournaledCacheStore(
+            legacy_path=None if self.compiled_path else CACHE_FILENAME)
+
+        # Any backends.ModelBackend; Gemini unless told otherwise
+        self.backend = backend or GeminiBackend(self.api_key, self.model_name)
+
+        # With defer_load the caller runs load_cache() itself, usually on a
+        # thread so a large cache doesn't hold up the first frame. Lookups
+        # made before it finishes wait for it.
+        self.cache_loaded = threading.Event()
+        if not defer_load:
+            self.load_cache()
+
+    def load_cache(self):
+        try:
+            journal = self.store.load()
+
+            # Entries written under an older key scheme are re-keyed once
+            migrated, collisions = migrate_cache(journal, self.normalizer)
+            if migrated.keys() != journal.keys():
+                log.info("Re-keyed cache: %d -> %d entries, %d merged",
+                         len(journal), len(migrated), len(collisions))
+                self.store.replace_all(migrated)
+                journal = migrated
+
+            if self.compiled_path:
+                self._compiled = CompiledCache(self.compiled_path)
+                cold = OverlayCache(self._compiled, journal)
+                self.cache = TieredCache(cold, self.hot_entries, self.hot_bytes)
+            else:
+                self.cache = TieredCache(journal, 0)
+            if not self.cache:
+                log.info("Cache is empty. Starting with empty cache.")
+        except Exception as e:
+            log.warning("Error loading cache: %s", e)
+            self.cache = TieredCache({}, 0)
+        finally:
+            self.cache_loaded.set()
+
+    def save_cache(self, entries=None):
+        """Append new entries to the journal, or compact everything when called bare"""
+        try:
+            if entries is None:
+                self.store.compact()
+            else:
+                self.store.append(entries)
+        except Exception as e:
+            log.warning("Error saving cache: %s", e)
+
+    def remember(self, entries):
+        """Add new entries to the cache, persist them and tell the listeners"""
+        with self._lock:
+            self.cache.update(entries)
+            self.save_cache(entries)
+            for listener in self.listeners:
+                listener(entries)
+
+    def make_cache_key(self, el1, el2):
+        return self.normalizer.make_key(el1, el2)
+
+    def call_gemini_api(self, el1, el2):
+        with self.profiler.span("call_gemini_api"):
+            self.cache_loaded.wait()
+            key = self.make_cache_key(el1, el2)
+
+            # Check cache first
+            cached = self.cache.get(key)
+            if cached is not None:
+                log.debug("Cache hit for %s + %s: %s", el1, el2, cached)
+                return cached
+
+            # Concurrent misses for the same pair wait on a single model call
+            return self._inflight.do(key, lambda: self._fetch_combination(el1, el2, key))
+
+    def _fetch_combination(self, el1, el2, key):
+        # Another caller may have filled the entry while we were queued
+        # (checked without counting; the lookup that got us here was the miss)
+        if key in self.cache:
+            return self.cache[key]
+
+        log.debug("Cache miss for %s + %s. Calling model...", el1, el2)
+
+        prompt = self.build_prompt(el1, el2)
+        try:
+            output = retry_with_backoff(lambda: self._generate_element(prompt),
+                                        max_retries=self.max_retries,
+                                        give_up_on=(CallBudgetExhausted,))
+            
+            # Cache the result
+            self.remember({key: output})
+            
+            log.debug("API result for %s + %s: %s", el1, el2, output)
+            return output
+            
+        except Exception as e:
+            log.warning("Error calling model: %s", e)
+            return f"❓Unknown"  # Return a default combination
+
+    def _generate(self, prompt):
+        """One rate-limited, measured model call"""
+        # The call is counted before waiting for a token, so concurrent
+        # callers can never overshoot max_api_calls between check and count
+        with self._lock:
+            if self.max_api_calls is not None and self.api_calls >= self.max_api_calls:
+                raise CallBudgetExhausted(f"all {self.max_api_calls} model calls are spent")
+            self.api_calls += 1
+            self.bytes_sent += len(prompt.encode('utf-8'))
+        self._rate_limiter.acquire()
+        with self._call_slots, self.profiler.span("model_call"):
+            started = time.perf_counter()
+            try:
+                text = self.backend.generate(prompt)
+            except Exception:
+                with self._lock:
+                    self.api_errors += 1
+                raise
+            finally:
+                elapsed = time.perf_counter() - started
+                with self._lock:
+                    self.api_seconds += elapsed
+                    self.api_latencies.append(elapsed)
+        with self._lock:
+            self.bytes_received += len(text.encode('utf-8'))
+        return text.strip()
+
+    def has_spare_capacity(self, reserve=1):
+        """Whether a speculative call now would leave real combines unhindered.
+
+        That is no other call in flight, and reserve rate limit tokens left
+        over once this one is paid for.
+        """
+        return not len(self._inflight) and self._rate_limiter.available() >= 1 + reserve
+
+    def _generate_element(self, prompt):
+        """One model call whose reply is cleaned up into a registered element name"""
+        text = self._generate(prompt)
+        name = clean_element_name(text)
+        if name is None:
+            with self._lock:
+                self.invalid_responses += 1
+            raise InvalidElementName(f"no element name in reply {text[:80]!r}")
+        return self.registry.preferred(name)
+
+    def stats(self):
+        """Cache tier counters plus model call counts, latency and traffic"""
+        with self._lock:
+            latencies = sorted(self.api_latencies)
+            stats = {
+                "api_calls": self.api_calls,
+                "api_errors": self.api_errors,
+                "invalid_responses": self.invalid_responses,
+                "api_seconds": self.api_seconds,
+                "bytes_sent": self.bytes_sent,
+                "bytes_received": self.bytes_received,
+                "in_flight": len(self._inflight),
+            }
+        if latencies:
+            stats["api_p50_ms"] = latencies[len(latencies) // 2] * 1000
+            stats["api_p99_ms"] = latencies[int(len(latencies) * 0.99)] * 1000
+        stats.update(self.cache.stats())
+        return stats
+
+    def build_prompt(self, el1, el2):
+        # Compose prompt for Gemini
+        return f"""{PROMPT_INSTRUCTIONS}Input: {el1} + {el2}
+Output: 
+
+"""
+
+    def build_batch_prompt(self, pairs):
+        """One prompt covering several pairs, answered as a JSON array"""
+        numbered = "\n".join(f"{i}. {el1} + {el2}" for i, (el1, el2) in enumerate(pairs, 1))
+        return f"""{PROMPT_INSTRUCTIONS}Now combine every numbered pair below.
+
+{numbered}
+
+Reply with ONLY a JSON array containing one object per pair, in the same order, like this:
+[{{"id": 1, "result": "💨Steam"}}, {{"id": 2, "result": "🌱Mud"}}]
+
+"""
+
+    def combine_async(self, el1, el2):
+        """Resolve a combination without blocking the caller.
+
+        Returns a concurrent.futures.Future. Cache hits come back as an
+        already-completed future; misses run on the worker pool, and repeated
+        requests for a pair that is already in flight share its future.
+        """
+        with self.profiler.span("combine_async"):
+            key = self.make_cache_key(el1, el2)
+            if not self.cache_loaded.is_set():
+                # The pair is claimed here, so no worker ever waits on a call
+                # that is still queued behind it; the worker only waits for
+                # the load, which runs outside the pool
+                return self._inflight.submit(key, self._executor,
+                                             lambda: self._fetch_when_loaded(el1, el2, key))
+
+            cached = self.cache.get(key)
+            if cached is not None:
+                future = Future()
+                future.set_result(cached)
+                return future
+            return self._inflight.submit(key, self._executor,
+                                         lambda: self._fetch_combination(el1, el2, key))
+
+    def _fetch_when_loaded(self, el1, el2, key):
+        """A combine_async lookup made before the cache finished loading"""
+        self.cache_loaded.wait()
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        return self._fetch_combination(el1, el2, key)
+
+    def combine_many(self, pairs):
+        """Resolve many pairs, packing the uncached ones into batched prompts.
+
+        Returns a dict mapping each (el1, el2) pair to its result. Pairs the
+        batch response doesn't answer cleanly fall back to single calls.
+        """
+        self.cache_loaded.wait()
+        results = {}
+        keys = {}
+        hits = {}
+        leading = {}   # key -> (pair, future) for calls this batch owns
+        waiting = {}   # key -> future of a call someone else already started
+
+        for pair in pairs:
+            key = self.make_cache_key(*pair)
+            keys[pair] = key
+            if key in hits or key in leading or key in waiting:
+                continue
+            cached = self.cache.get(key)
+            if cached is not None:
+                hits[key] = cached
+                continue
+            future, leader = self._inflight.claim(key)
+            if leader:
+                leading[key] = (pair, future)
+            else:
+                waiting[key] = future
+
+        batch = list(leading.items())
+        for start in range(0, len(batch), MAX_BATCH_SIZE):
+            with self.profiler.span("combine_batch"):
+                self._resolve_batch(batch[start:start + MAX_BATCH_SIZE])
+
+        for pair, key in keys.items():
+            if key in hits:
+                results[pair] = hits[key]
+            elif key in waiting:
+                results[pair] = waiting[key].result()
+            else:
+                results[pair] = self.cache[key] if key in self.cache else "❓Unknown"
+        return results
+
+    def _resolve_batch(self, batch):
+        """Ask for a chunk of claimed (key, (pair, future)) items in one request"""
+        pairs = [pair for _, (pair, _) in batch]
+        log.debug("Batch of %d cache misses. Calling model...", len(pairs))
+
+        answers = {}
+        try:
+            text = retry_with_backoff(lambda: self._generate(self.build_batch_prompt(pairs)),
+                                      max_retries=self.max_retries,
+                                      give_up_on=(CallBudgetExhausted,))
+            answers = parse_batch_response(text, len(pairs))
+        except Exception as e:
+            log.warning("Error calling model for batch: %s", e)
+
+        # Everything the batch answered lands in the cache with a single write
+        found = {key: self.registry.preferred(answers[i])
+                 for i, (key, _) in enumerate(batch, 1) if i in answers}
+        if found:
+            self.remember(found)
+
+        for key, (pair, future) in batch:
+            try:
+                result = found.get(key)
+                if result is None:
+                    log.debug("No usable batch answer for %s + %s, asking alone", pair[0], pair[1])
+                    result = self._fetch_combination(pair[0], pair[1], key)
+            except Exception as e:
+                self._inflight.settle(key, future, error=e)
+            else:
+                self._inflight.settle(key, future, result)
+
+    def shutdown(self, wait=False):
+        """Stop the worker pool, dropping combinations not started yet, and close the cache files"""
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+        self.store.close()
+        if self._compiled is not None:
+            self._compiled.close()
+            self._compiled = None
+
+    def combine_elements(self, el1, el2):
+        """Alternative method name for compatibility"""
+        return self.call_gemini_api(el1, el2)
+
+
+def parse_batch_response(text, count):
+    """Pull {id: result} out of a batch reply, skipping anything malformed"""
+    # Models like to wrap JSON in markdown fences
+    match = re.search(r"\[.*\]", text, re.DOTALL)
+    if not match:
+        return {}
+    try:
+        items = json.loads(match.group(0))
+    except json.JSONDecodeError:
+        return {}
+    if not isinstance(items, list):
+        return {}
+
+    answers = {}
+    for position, item in enumerate(items, 1):
+        if isinstance(item, dict):
+            index, result = item.get("id", position), item.get("result")
+        else:
+            index, result = position, item
+        if not isinstance(index, int) or not 1 <= index <= count:
+            continue
+        name = clean_element_name(result) if isinstance(result, str) else None
+        if name is None:
+            continue
+        answers[index] = name
+    return answers
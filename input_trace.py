@@ -0,0 +1,78 @@
+import json
+
+import pygame
+
+# Event types a session depends on, with the attributes needed to replay them
+TRACE_FIELDS = {
+    pygame.QUIT: (),
+    pygame.MOUSEMOTION: ("pos", "rel", "buttons"),
+    pygame.MOUSEBUTTONDOWN: ("pos", "button"),
+    pygame.MOUSEBUTTONUP: ("pos", "button"),
+    pygame.MOUSEWHEEL: ("x", "y"),
+    pygame.TEXTINPUT: ("text",),
+    pygame.KEYDOWN: ("key", "mod"),
+    pygame.KEYUP: ("key", "mod"),
+}
+
+
+def encode_event(event):
+    fields = {name: getattr(event, name) for name in TRACE_FIELDS[event.type]}
+    return [pygame.event.event_name(event.type), fields]
+
+
+def decode_event(data):
+    name, fields = data
+    event_type = getattr(pygame, name.upper())
+    # JSON turns tuples into lists; pygame hands them out as tuples
+    fields = {k: tuple(v) if isinstance(v, list) else v for k, v in fields.items()}
+    return pygame.event.Event(event_type, fields)
+
+
+class TraceRecorder:
+    """Writes the input of a session as JSON lines, one per frame.
+
+    Each line is {"t": milliseconds, "events": [[type, fields], ...]}, so a
+    replay gets the same events at the same game time. Frames without input
+    are kept too, since they still advance timers and resolve combinations.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'w', encoding='utf-8')
+
+    def record(self, now, events):
+        line = {"t": now, "events": [encode_event(e) for e in events if e.type in TRACE_FIELDS]}
+        self._file.write(json.dumps(line, ensure_ascii=False) + "\n")
+
+    def close(self):
+        self._file.close()
+
+
+def save_trace(path, frames):
+    recorder = TraceRecorder(path)
+    try:
+        for now, events in frames:
+            recorder.record(now, events)
+    finally:
+        recorder.close()
+
+
+def load_trace(path):
+    """[(now, [events])] for every recorded frame"""
+    frames = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                frame = json.loads(line)
+                frames.append((frame["t"], [decode_event(e) for e in frame["events"]]))
+    return frames
+
+
+def replay(game, frames, on_frame=None):
+    """Feed recorded frames through game.step; on_frame(now, update) sees each result"""
+    for now, events in frames:
+        update = game.step(events, now)
+        if on_frame:
+            on_frame(now, update)
+        if not game.running:
+            break
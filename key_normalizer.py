@@ -0,0 +1,126 @@
+import argparse
+import json
+import re
+import threading
+import unicodedata
+
+# Keycaps ("1" + U+FE0F + U+20E3) start with a plain digit, so they need their
+# own alternative or the digit would survive the character class below
+_KEYCAP = "[0-9#*]\ufe0f?\u20e3"
+
+# Emoji code points plus everything that glues them together: variation
+# selectors, zero width joiners, skin tone modifiers and tag sequences
+_EMOJI_CHARS = ("["
+                "\u00a9\u00ae\u203c\u2049\u2122\u2139"
+                "\u2194-\u2199\u21a9-\u21aa"
+                "\u231a-\u231b\u2328\u23cf\u23e9-\u23f3\u23f8-\u23fa"
+                "\u24c2\u25aa-\u25ab\u25b6\u25c0\u25fb-\u25fe"
+                "\u2600-\u27bf"            # misc symbols & dingbats
+                "\u2934-\u2935\u2b05-\u2b07\u2b1b-\u2b1c\u2b50\u2b55"
+                "\u3030\u303d\u3297\u3299"
+                "\U0001F000-\U0001FAFF"    # all pictograph blocks, flags, skin tones
+                "\u200d"                   # zero width joiner
+                "\u20e3"                   # combining enclosing keycap
+                "\ufe00-\ufe0f"            # variation selectors
+                "\U000E0020-\U000E007F"    # tag sequences (subdivision flags)
+                "\U000E0100-\U000E01EF"    # variation selectors supplement
+                "]")
+
+EMOJI_PATTERN = re.compile(f"{_KEYCAP}|{_EMOJI_CHARS}+")
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+class KeyNormalizer:
+    """Maps element names to the canonical form used in cache keys.
+
+    Names are stripped of emoji, NFKC normalized, case folded and have their
+    whitespace collapsed, so "🌪️Tornado", "🌪Tornado" and " tornado " all
+    share one key. Canonical forms are memoized since the same few names are
+    looked up on every combination.
+    """
+
+    def __init__(self, max_memo_size=100_000):
+        self.max_memo_size = max_memo_size
+        self._memo = {}
+        self._lock = threading.Lock()
+
+    def canonical_name(self, name):
+        canonical = self._memo.get(name)
+        if canonical is None:
+            canonical = self._normalize(name)
+            with self._lock:
+                if len(self._memo) >= self.max_memo_size:
+                    self._memo.clear()
+                self._memo[name] = canonical
+        return canonical
+
+    def _normalize(self, name):
+        # Strip before NFKC too, otherwise compatibility mappings turn
+        # symbols like "™" or "Ⓜ" into letters
+        text = EMOJI_PATTERN.sub('', name)
+        text = unicodedata.normalize('NFKC', text)
+        text = EMOJI_PATTERN.sub('', text)
+        return WHITESPACE_PATTERN.sub(' ', text).strip().casefold()
+
+    def make_key(self, el1, el2):
+        a = self.canonical_name(el1)
+        b = self.canonical_name(el2)
+        return f"{a}+{b}" if a <= b else f"{b}+{a}"
+
+
+default_normalizer = KeyNormalizer()
+
+
+def migrate_cache(cache, normalizer=default_normalizer):
+    """Re-key a cache dict with the current normalizer.
+
+    Returns (migrated, collisions). When several old keys collapse into one,
+    the entry whose key was already canonical wins, otherwise the first one
+    seen. collisions maps each merged key to the values that were dropped.
+    """
+    migrated = {}
+    already_canonical = set()
+    collisions = {}
+
+    for old_key, value in cache.items():
+        left, sep, right = old_key.partition('+')
+        new_key = normalizer.make_key(left, right) if sep else normalizer.canonical_name(old_key)
+        is_canonical = new_key == old_key
+
+        if new_key not in migrated:
+            migrated[new_key] = value
+        elif migrated[new_key] != value:
+            if is_canonical and new_key not in already_canonical:
+                collisions.setdefault(new_key, []).append(migrated[new_key])
+                migrated[new_key] = value
+            else:
+                collisions.setdefault(new_key, []).append(value)
+
+        if is_canonical:
+            already_canonical.add(new_key)
+
+    return migrated, collisions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-key element_cache.json with the current key normalizer")
+    parser.add_argument('path', nargs='?', default='element_cache.json')
+    parser.add_argument('--dry-run', action='store_true', help="Report changes without writing")
+    args = parser.parse_args()
+
+    with open(args.path, 'r', encoding='utf-8') as f:
+        cache = json.load(f)
+
+    migrated, collisions = migrate_cache(cache)
+    changed = sum(1 for key in cache if key not in migrated)
+    print(f"{len(cache)} entries -> {len(migrated)} entries ({changed} re-keyed, {len(collisions)} merged)")
+    for key, dropped in collisions.items():
+        print(f"  {key}: kept {migrated[key]}, dropped {', '.join(dropped)}")
+
+    if not args.dry_run:
+        with open(args.path, 'w', encoding='utf-8') as f:
+            json.dump(migrated, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
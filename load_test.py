@@ -0,0 +1,89 @@
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+
+from backends import FakeBackend, HttpBackend
+from cache_store import JournaledCacheStore
+from game_logic import ElementCombiner
+
+
+def run_load_test(backend, requests=10000, distinct_pairs=500, threads=16,
+                  max_concurrent_calls=32, calls_per_second=10000.0, seed=0):
+    """Hammer call_gemini_api from many threads and report what reached the backend.
+
+    The cache lives in a throwaway directory, so every run starts cold.
+    """
+    rng = random.Random(seed)
+    pairs = [(f"Item {rng.randrange(10**6)}", f"Item {rng.randrange(10**6)}")
+             for _ in range(distinct_pairs)]
+    workload = [rng.choice(pairs) for _ in range(requests)]
+    chunks = [workload[i::threads] for i in range(threads)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = JournaledCacheStore(base_path=os.path.join(tmp, 'cache'), legacy_path=None, fsync=False)
+        combiner = ElementCombiner(backend=backend, store=store, compiled_path=None, max_workers=threads,
+                                   max_concurrent_calls=max_concurrent_calls,
+                                   calls_per_second=calls_per_second, burst=max_concurrent_calls)
+
+        latencies = []
+        lock = threading.Lock()
+
+        def worker(chunk):
+            local = []
+            for el1, el2 in chunk:
+                start = time.perf_counter()
+                combiner.call_gemini_api(el1, el2)
+                local.append(time.perf_counter() - start)
+            with lock:
+                latencies.extend(local)
+
+        started = time.perf_counter()
+        workers = [threading.Thread(target=worker, args=(chunk,)) for chunk in chunks]
+        for t in workers:
+            t.start()
+        for t in workers:
+            t.join()
+        elapsed = time.perf_counter() - started
+        combiner.shutdown(wait=True)
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "elapsed_s": elapsed,
+        "requests_per_s": requests / elapsed,
+        "backend_calls": combiner.api_calls,
+        "distinct_pairs": len(set(combiner.make_cache_key(*p) for p in pairs)),
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99)] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the combine pipeline against a fake model")
+    parser.add_argument('--requests', type=int, default=10000)
+    parser.add_argument('--distinct-pairs', type=int, default=500)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--latency', type=float, default=0.05, help="Fake model seconds per call")
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--max-rps', type=float, default=None, help="Fake model throughput cap")
+    parser.add_argument('--url', help="Use a stand-in server (python backends.py) instead of an in-process fake")
+    args = parser.parse_args()
+
+    if args.url:
+        backend = HttpBackend(args.url)
+    else:
+        backend = FakeBackend(latency=args.latency, error_rate=args.error_rate, max_rps=args.max_rps)
+
+    stats = run_load_test(backend, requests=args.requests, distinct_pairs=args.distinct_pairs,
+                          threads=args.threads)
+    print(f"{stats['requests']} requests in {stats['elapsed_s']:.2f}s "
+          f"({stats['requests_per_s']:.0f} req/s)")
+    print(f"{stats['backend_calls']} backend calls for {stats['distinct_pairs']} distinct pairs")
+    print(f"latency p50 {stats['p50_ms']:.2f}ms, p99 {stats['p99_ms']:.2f}ms")
+
+
+if __name__ == '__main__':
+    main()
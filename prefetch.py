@@ -0,0 +1,85 @@
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Prefetcher:
+    """Speculatively resolves the combinations a player is about to try.
+
+    Whenever an element is placed or dragged, the uncached pairs it forms
+    with itself and with the nearest canvas elements are queued on a single
+    low-priority worker. Moving the focus elsewhere cancels whatever hasn't
+    started yet. Prefetches go through call_gemini_api, so if the real drop
+    arrives while one is in flight it joins that call instead of paying again.
+
+    Prefetches share the combiner's rate limit with real drops, so one only
+    reaches the model while nothing else is in flight and reserve tokens
+    would be left for the player; otherwise it is skipped.
+    """
+
+    def __init__(self, combiner, radius=150, max_pairs=6, budget=100, reserve=1):
+        self.combiner = combiner
+        self.radius = radius
+        self.max_pairs = max_pairs
+        self.budget = budget  # prefetches allowed to reach the model per session
+        self.reserve = reserve  # rate limit tokens always left for real drops
+        self.skipped = 0  # prefetches dropped for want of spare capacity
+        self.spent = 0
+        self.enabled = True
+
+        # One worker keeps speculative traffic from crowding out real combines
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prefetch")
+        self._queued = []
+        self._focus = None
+
+    def focus(self, name, rect, canvas):
+        """Queue likely pairs for the element at rect, replacing stale work"""
+        if not self.enabled or self.spent >= self.budget:
+            return
+
+        pairs = self._candidate_pairs(name, rect, canvas)
+        if pairs == self._focus:
+            return  # same neighbourhood as last time; keep the queue as is
+        self._focus = pairs
+
+        self.cancel()
+        for other in pairs:
+            self._queued.append(self._executor.submit(self._prefetch, name, other))
+
+    def _candidate_pairs(self, name, rect, canvas):
+        nearby = [(distance_sq, elem["element"]["name"])
+                  for distance_sq, elem in canvas.near(rect.center, self.radius)
+                  if "pending" not in elem and elem["rect"] is not rect]
+        nearby.sort()
+
+        pairs = []
+        seen = set()
+        for other in [name] + [n for _, n in nearby]:
+            key = self.combiner.make_cache_key(name, other)
+            if key in seen or key in self.combiner.cache:
+                continue
+            seen.add(key)
+            pairs.append(other)
+            if len(pairs) >= self.max_pairs:
+                break
+        return tuple(pairs)
+
+    def _prefetch(self, el1, el2):
+        # Checked again here: the pair may have been resolved while queued
+        if self.spent >= self.budget:
+            return
+        if self.combiner.make_cache_key(el1, el2) in self.combiner.cache:
+            return
+        if not self.combiner.has_spare_capacity(self.reserve):
+            self.skipped += 1
+            return
+        self.spent += 1
+        self.combiner.call_gemini_api(el1, el2)
+
+    def cancel(self):
+        """Drop queued prefetches that haven't started"""
+        for future in self._queued:
+            future.cancel()
+        self._queued = []
+
+    def shutdown(self):
+        self.cancel()
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,186 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+
+
+class _NullSpan:
+    """What span() hands out while profiling is off"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ('profiler', 'name', 'started')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.record(self.name, self.started, time.perf_counter())
+        return False
+
+
+class Profiler:
+    """Named timing spans, per-frame phase totals and an optional trace file.
+
+    Wrap hot paths in ``with profiler.span("name"):``. While enabled is
+    False a span is one attribute check and a shared no-op context manager,
+    so the instrumentation can stay in place. Spans timed on the thread
+    that calls begin_frame() add up into that frame's phases; spans on any
+    thread go to the trace file.
+
+    The trace is Chrome's trace event format (chrome://tracing, Perfetto,
+    speedscope). Events are buffered and written in chunks; the closing
+    bracket is optional in that format, so a trace cut short by a crash
+    still loads.
+    """
+
+    def __init__(self, enabled=False, history=120, flush_every=2000):
+        self.enabled = enabled
+        self.frame_times = deque(maxlen=history)      # seconds of work per frame
+        self.frame_intervals = deque(maxlen=history)  # seconds between frame starts
+        self.phase_history = deque(maxlen=history)    # {phase: seconds} per frame
+        self.phase_totals = {}  # {phase: seconds} since the last reset()
+        self.frame_count = 0
+        self.flush_every = flush_every
+
+        self._frame_thread = None
+        self._frame_start = None
+        self._phases = {}
+        self._origin = time.perf_counter()
+        self._trace_file = None
+        self._events = []
+        self._named_threads = set()
+        self._thread_names = []  # (tid, name) not written yet
+        self._lock = threading.Lock()
+
+    def span(self, name):
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name)
+
+    def record(self, name, started, ended):
+        """Account a finished span (perf_counter start and end)"""
+        if threading.get_ident() == self._frame_thread:
+            self._phases[name] = self._phases.get(name, 0.0) + (ended - started)
+        if self._trace_file is not None:
+            self._trace(name, started, ended)
+
+    # Frames
+
+    def begin_frame(self):
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        if self._frame_start is not None:
+            self.frame_intervals.append(now - self._frame_start)
+        self._frame_thread = threading.get_ident()
+        self._frame_start = now
+        self._phases = {}
+
+    def end_frame(self):
+        if not self.enabled or self._frame_start is None:
+            return
+        ended = time.perf_counter()
+        self.frame_times.append(ended - self._frame_start)
+        self.phase_history.append(self._phases)
+        self.frame_count += 1
+        for name, seconds in self._phases.items():
+            self.phase_totals[name] = self.phase_totals.get(name, 0.0) + seconds
+        if self._trace_file is not None:
+            self._trace("frame", self._frame_start, ended)
+
+    def fps(self):
+        if not self.frame_intervals:
+            return 0.0
+        return len(self.frame_intervals) / sum(self.frame_intervals)
+
+    def phase_averages(self, recent=True):
+        """{phase: mean milliseconds per frame}, over the recent frames or since reset()"""
+        if recent:
+            totals = {}
+            for phases in self.phase_history:
+                for name, seconds in phases.items():
+                    totals[name] = totals.get(name, 0.0) + seconds
+            frames = len(self.phase_history)
+        else:
+            totals, frames = self.phase_totals, self.frame_count
+        return {name: seconds * 1000 / (frames or 1) for name, seconds in totals.items()}
+
+    def reset(self):
+        for history in (self.frame_times, self.frame_intervals, self.phase_history):
+            history.clear()
+        self.phase_totals = {}
+        self.frame_count = 0
+        self._frame_start = None
+
+    # Trace file
+
+    @property
+    def tracing(self):
+        return self._trace_file is not None
+
+    def start_trace(self, path):
+        """Record every span from now on to path; also turns profiling on"""
+        self.stop_trace()
+        self.enabled = True
+        self._trace_file = open(path, 'w', encoding='utf-8')
+        self._trace_file.write('[\n')
+        self._named_threads = set()
+        self._thread_names = []
+
+    def _trace(self, name, started, ended):
+        # Kept as tuples; they only become JSON when a chunk is written
+        tid = threading.get_ident()
+        with self._lock:
+            if tid not in self._named_threads:
+                self._named_threads.add(tid)
+                self._thread_names.append((tid, threading.current_thread().name))
+            self._events.append((name, tid, started, ended))
+            if len(self._events) >= self.flush_every:
+                self._flush_locked()
+
+    def _flush_locked(self):
+        if self._trace_file is None:
+            return
+        pid = os.getpid()
+        lines = [json.dumps({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid,
+                             "args": {"name": thread_name}}) + ',\n'
+                 for tid, thread_name in self._thread_names]
+        origin = self._origin
+        lines.extend(json.dumps({"name": name, "ph": "X", "pid": pid, "tid": tid,
+                                 "ts": round((started - origin) * 1e6, 3),
+                                 "dur": round((ended - started) * 1e6, 3)}) + ',\n'
+                     for name, tid, started, ended in self._events)
+        self._trace_file.write(''.join(lines))
+        self._thread_names = []
+        self._events = []
+
+    def stop_trace(self):
+        with self._lock:
+            if self._trace_file is None:
+                return
+            self._flush_locked()
+            # A trailing metadata event keeps the array valid JSON after the last comma
+            self._trace_file.write(json.dumps({"name": "process_name", "ph": "M", "pid": os.getpid(),
+                                               "args": {"name": "InfinityCrafter"}}) + '\n]\n')
+            self._trace_file.close()
+            self._trace_file = None
+
+
+# Shared by the game loop and the combiner, like key_normalizer.default_normalizer
+default_profiler = Profiler()
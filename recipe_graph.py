@@ -0,0 +1,165 @@
+import heapq
+from collections import defaultdict
+
+from game_logic import BASE_ELEMENTS
+from key_normalizer import default_normalizer
+
+
+class RecipeGraph:
+    """In-memory index over the combination cache.
+
+    Nodes are canonical element names. For every "a+b" -> result entry it
+    keeps:
+      - a reverse index  result -> {(a, b)} of recipes that make it
+      - a parent index   result -> {a, b} of ingredients it can come from
+      - a use index      element -> {(other, result)} it takes part in
+
+    level[x] is the fewest combination rounds needed to reach x from the
+    base elements, kept up to date incrementally as entries are added.
+    """
+
+    def __init__(self, base_elements=BASE_ELEMENTS, normalizer=default_normalizer):
+        self.normalizer = normalizer
+        self.display = {}  # canonical name -> display form
+        self.level = {}
+        self._best = {}    # canonical name -> recipe that achieves its level
+        self._recipes = defaultdict(set)
+        self._parents = defaultdict(set)
+        self._uses = defaultdict(set)
+        self.edge_count = 0
+
+        self.base = set()
+        for name in base_elements:
+            canonical = self._node(name)
+            self.base.add(canonical)
+            self.level[canonical] = 0
+
+    @classmethod
+    def from_cache(cls, cache, **kwargs):
+        graph = cls(**kwargs)
+        for key, result in cache.items():
+            a, sep, b = key.partition('+')
+            if sep:
+                graph._index(a, b, result)
+        # One propagation pass instead of one per edge
+        graph._propagate(graph.base)
+        return graph
+
+    def _node(self, name):
+        canonical = self.normalizer.canonical_name(name)
+        # The first display form seen wins; cache keys themselves carry none
+        if canonical not in self.display or self.display[canonical] == canonical:
+            self.display[canonical] = name
+        return canonical
+
+    def _index(self, el1, el2, result):
+        a, b = self._node(el1), self._node(el2)
+        r = self._node(result)
+        recipe = (a, b) if a <= b else (b, a)
+        if recipe in self._recipes[r]:
+            return None
+        self._recipes[r].add(recipe)
+        self._parents[r].update(recipe)
+        self._uses[a].add((b, r))
+        self._uses[b].add((a, r))
+        self.edge_count += 1
+        return a, b, r
+
+    # Updates
+
+    def add_combination(self, el1, el2, result):
+        """Index one new combination and update levels that it improves"""
+        edge = self._index(el1, el2, result)
+        if edge is None:
+            return
+        a, b, r = edge
+        if a in self.level and b in self.level:
+            candidate = max(self.level[a], self.level[b]) + 1
+            if candidate < self.level.get(r, float('inf')):
+                self.level[r] = candidate
+                self._best[r] = (a, b)
+                self._propagate([r])
+
+    def add_entries(self, entries):
+        """Listener hook for ElementCombiner: index new "a+b" -> result entries"""
+        for key, result in entries.items():
+            a, sep, b = key.partition('+')
+            if sep:
+                self.add_combination(a, b, result)
+
+    def _propagate(self, sources):
+        # Dijkstra over the AND-graph: a result's level only depends on the
+        # larger of its two ingredient levels, so settled nodes stay settled
+        heap = [(self.level[s], s) for s in sources]
+        heapq.heapify(heap)
+        while heap:
+            level, node = heapq.heappop(heap)
+            if level > self.level[node]:
+                continue
+            for other, result in self._uses[node]:
+                other_level = self.level.get(other)
+                if other_level is None:
+                    continue
+                candidate = max(level, other_level) + 1
+                if candidate < self.level.get(result, float('inf')):
+                    self.level[result] = candidate
+                    self._best[result] = (node, other) if node <= other else (other, node)
+                    heapq.heappush(heap, (candidate, result))
+
+    # Queries
+
+    def recipes_for(self, name):
+        """Every known (a, b) pair that produces name, as display names"""
+        return [(self.display[a], self.display[b])
+                for a, b in self._recipes.get(self.normalizer.canonical_name(name), ())]
+
+    def parents_of(self, name):
+        return [self.display[p] for p in self._parents.get(self.normalizer.canonical_name(name), ())]
+
+    def uses_of(self, name):
+        """(other ingredient, result) for every combination name takes part in"""
+        return [(self.display[o], self.display[r])
+                for o, r in self._uses.get(self.normalizer.canonical_name(name), ())]
+
+    def level_of(self, name):
+        return self.level.get(self.normalizer.canonical_name(name))
+
+    def derivation(self, name):
+        """Shortest list of (a, b, result) steps that makes name from the base set.
+
+        Returns None when name can't be reached from the base elements.
+        """
+        target = self.normalizer.canonical_name(name)
+        if target not in self.level:
+            return None
+
+        steps = []
+        done = set(self.base)
+        # Iterative post-order walk so deep chains don't hit the recursion limit
+        stack = [(target, False)]
+        while stack:
+            node, expanded = stack.pop()
+            if node in done:
+                continue
+            a, b = self._best[node]
+            if expanded:
+                done.add(node)
+                steps.append((self.display[a], self.display[b], self.display[node]))
+            else:
+                stack.append((node, True))
+                stack.append((b, False))
+                stack.append((a, False))
+        return steps
+
+    def frontier(self, limit=None):
+        """Reachable elements ordered from least to most explored.
+
+        Elements that appear in the fewest known combinations are the ones a
+        crawler learns the most from expanding next.
+        """
+        ranked = sorted(self.level, key=lambda n: (len(self._uses.get(n, ())), self.level[n]))
+        names = [self.display[n] for n in ranked]
+        return names[:limit] if limit is not None else names
+
+    def use_count(self, name):
+        return len(self._uses.get(self.normalizer.canonical_name(name), ()))
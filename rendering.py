@@ -0,0 +1,220 @@
+from collections import OrderedDict
+
+import pygame
+
+from profiler import default_profiler
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional; the fallback is only used on cache misses
+    np = None
+
+
+def render_gradient(size, top_color, bottom_color):
+    """Build a vertical gradient surface of the given size in one pass"""
+    width, height = size
+    surface = pygame.Surface(size)
+    if pygame.display.get_surface() is not None:
+        surface = surface.convert()
+
+    if np is not None and height > 0:
+        ratio = np.arange(height, dtype=np.float64)[:, None] / height
+        top = np.asarray(top_color[:3], dtype=np.float64)
+        bottom = np.asarray(bottom_color[:3], dtype=np.float64)
+        # astype truncates like int() did in the old per-line loop
+        column = (top * (1 - ratio) + bottom * ratio).astype(np.uint8)
+        pygame.surfarray.blit_array(surface, np.broadcast_to(column, (width, height, 3)))
+    else:
+        # Paint one pixel column, then stretch it across the width
+        column = pygame.Surface((1, height))
+        for y in range(height):
+            ratio = y / height
+            column.set_at((0, y), tuple(int(t * (1 - ratio) + b * ratio)
+                                        for t, b in zip(top_color[:3], bottom_color[:3])))
+        surface.blit(pygame.transform.scale(column, size), (0, 0))
+    return surface
+
+
+class BackgroundCache:
+    """Keeps the rendered background until the theme or window size changes"""
+
+    def __init__(self, profiler=None):
+        self.profiler = profiler or default_profiler
+        self._key = None
+        self._surface = None
+
+    def get(self, size, top_color, bottom_color, theme=None):
+        key = (tuple(size), tuple(top_color), tuple(bottom_color), theme)
+        if key != self._key:
+            with self.profiler.span("gradient"):
+                self._surface = render_gradient(size, top_color, bottom_color)
+            self._key = key
+        return self._surface
+
+    def invalidate(self):
+        self._key = None
+        self._surface = None
+
+
+class LabelCache:
+    """Bounded LRU of rendered text surfaces keyed by (text, font, color).
+
+    Element names rarely change, so after the first frame every label is a
+    dictionary lookup instead of an anti-aliased rasterization.
+    """
+
+    def __init__(self, max_entries=512, profiler=None):
+        self.max_entries = max_entries
+        self.profiler = profiler or default_profiler
+        self.hits = 0
+        self.misses = 0
+        self._surfaces = OrderedDict()
+
+    def render(self, font, text, color, antialias=True):
+        key = (text, font, tuple(color), antialias)
+        surface = self._surfaces.get(key)
+        if surface is not None:
+            self._surfaces.move_to_end(key)
+            self.hits += 1
+            return surface
+
+        self.misses += 1
+        with self.profiler.span("text"):
+            surface = font.render(text, antialias, color)
+        self._surfaces[key] = surface
+        if len(self._surfaces) > self.max_entries:
+            self._surfaces.popitem(last=False)
+        return surface
+
+    def blit_centered(self, screen, font, text, color, rect):
+        """Draw a cached label centred on rect"""
+        surface = self.render(font, text, color)
+        screen.blit(surface, surface.get_rect(center=rect.center))
+
+    def stats(self):
+        return {"entries": len(self._surfaces), "hits": self.hits, "misses": self.misses}
+
+    def clear(self):
+        self._surfaces.clear()
+
+
+class DirtyRegions:
+    """Screen areas that changed since the last frame was presented.
+
+    take() hands back the areas to redraw and pass to display.update(),
+    merging overlapping ones. Past max_rects, or after mark_all(), the
+    whole screen is returned instead.
+    """
+
+    def __init__(self, screen_rect, max_rects=16):
+        self.screen_rect = pygame.Rect(screen_rect)
+        self.max_rects = max_rects
+        self._rects = []
+        self._full = True  # nothing has been presented yet
+
+    def __bool__(self):
+        return self._full or bool(self._rects)
+
+    def mark(self, *rects):
+        for rect in rects:
+            if rect is None:
+                continue
+            rect = pygame.Rect(rect).clip(self.screen_rect)
+            if rect.width and rect.height:
+                self._rects.append(rect)
+
+    def mark_all(self):
+        self._full = True
+
+    def take(self):
+        rects, full = self._rects, self._full
+        self._rects, self._full = [], False
+        if not full:
+            rects = merge_rects(rects)
+        if full or len(rects) > self.max_rects:
+            return [self.screen_rect.copy()]
+        return rects
+
+
+def merge_rects(rects):
+    """Union overlapping rects until none of the results overlap"""
+    merged = []
+    for rect in rects:
+        rect = rect.copy()
+        i = 0
+        while i < len(merged):
+            if merged[i].colliderect(rect):
+                rect.union_ip(merged.pop(i))
+                i = 0  # the grown rect may now reach ones already passed
+            else:
+                i += 1
+        merged.append(rect)
+    return merged
+
+
+class ProfilerOverlay:
+    """On-screen panel of a Profiler's numbers (F2 toggles it in game).
+
+    The panel is re-rendered at most every refresh_ms and blitted from the
+    cached surface in between, so the overlay costs little of the frame
+    time it reports.
+    """
+
+    WIDTH, HEIGHT = 260, 200
+    BUDGET_MS = 1000 / 60
+
+    def __init__(self, profiler, font, topleft=(10, 10), refresh_ms=250):
+        self.profiler = profiler
+        self.font = font
+        self.rect = pygame.Rect(topleft, (self.WIDTH, self.HEIGHT))
+        self.refresh_ms = refresh_ms
+        self._surface = None
+        self._rendered_at = None
+
+    def due(self, now):
+        return self._rendered_at is None or now - self._rendered_at >= self.refresh_ms
+
+    def update(self, now, lines=()):
+        """Re-render the panel from the profiler's current numbers plus extra lines"""
+        profiler = self.profiler
+        # Opaque, so blitting it again over itself never darkens the frame
+        surface = pygame.Surface(self.rect.size)
+        surface.fill((20, 20, 20))
+
+        frame_ms = sorted(t * 1000 for t in profiler.frame_times)
+        text = [f"FPS {profiler.fps():.1f}"]
+        if frame_ms:
+            text[0] += (f"   frame {frame_ms[len(frame_ms) // 2]:.1f}ms"
+                        f"  p99 {frame_ms[int(len(frame_ms) * 0.99)]:.1f}ms")
+        phases = sorted(profiler.phase_averages().items(), key=lambda item: -item[1])
+        text.extend(f"{name:<16}{ms:6.2f}ms" for name, ms in phases[:6])
+        text.extend(lines)
+
+        y = 4
+        for line in text:
+            label = self.font.render(line, True, (255, 255, 255))
+            surface.blit(label, (6, y))
+            y += label.get_height()
+
+        # Frame time histogram, newest on the right; the line is the 60 FPS budget
+        chart = pygame.Rect(6, self.HEIGHT - 46, self.WIDTH - 12, 40)
+        scale = chart.height / (2 * self.BUDGET_MS)
+        bar_width = max(1, chart.width // max(1, profiler.frame_times.maxlen))
+        x = chart.right - bar_width * len(profiler.frame_times)
+        for seconds in profiler.frame_times:
+            ms = seconds * 1000
+            color = (80, 200, 80) if ms <= self.BUDGET_MS else (230, 200, 60) if ms <= 2 * self.BUDGET_MS else (230, 70, 70)
+            height = min(chart.height, max(1, int(ms * scale)))
+            surface.fill(color, (x, chart.bottom - height, bar_width, height))
+            x += bar_width
+        budget_y = chart.bottom - int(self.BUDGET_MS * scale)
+        pygame.draw.line(surface, (255, 255, 255), (chart.x, budget_y), (chart.right, budget_y))
+
+        self._surface = surface
+        self._rendered_at = now
+
+    def draw(self, screen):
+        """Blit the last rendered panel; returns the area it covers"""
+        if self._surface is not None:
+            screen.blit(self._surface, self.rect)
+        return self.rect
@@ -0,0 +1,116 @@
+import logging
+import random
+import threading
+import time
+from concurrent.futures import Future
+
+log = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """Collapses concurrent calls for the same key into one.
+
+    The first caller for a key runs the function; everyone who asks for the
+    same key while it is still running gets the same result (or exception).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}  # key -> Future of the call currently in flight
+
+    def __len__(self):
+        """Calls currently in flight"""
+        return len(self._calls)
+
+    def claim(self, key):
+        """Return (future, leader). A leader must later settle() the future."""
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                return future, False
+            future = Future()
+            self._calls[key] = future
+            return future, True
+
+    def settle(self, key, future, result=None, error=None):
+        with self._lock:
+            del self._calls[key]
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def _run(self, key, future, fn):
+        try:
+            result = fn()
+        except BaseException as e:
+            self.settle(key, future, error=e)
+        else:
+            self.settle(key, future, result)
+
+    def do(self, key, fn):
+        """Run fn for key on the calling thread, or wait for the call already in flight"""
+        future, leader = self.claim(key)
+        if leader:
+            self._run(key, future, fn)
+        return future.result()
+
+    def submit(self, key, executor, fn):
+        """Like do(), but runs fn on executor and returns the shared Future"""
+        future, leader = self.claim(key)
+        if leader:
+            executor.submit(self._run, key, future, fn)
+        return future
+
+
+class TokenBucket:
+    """Blocking token-bucket rate limiter shared by every thread that calls acquire()"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)  # tokens added per second
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        """Add the tokens earned since the last refill; caller holds the lock"""
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def available(self):
+        """Tokens that could be taken right now without waiting"""
+        with self._lock:
+            self._refill()
+            return self._tokens
+
+    def acquire(self, tokens=1):
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def retry_with_backoff(fn, max_retries=3, base_delay=0.5, max_delay=8.0, retry_on=(Exception,),
+                       give_up_on=()):
+    """Call fn, retrying failures with exponential backoff and full jitter.
+
+    Exceptions in give_up_on are raised straight away, even if retry_on
+    covers them too.
+    """
+    attempt = 0
+    while True:
+        try:
+            return fn()
+        except retry_on as e:
+            if attempt >= max_retries or isinstance(e, give_up_on):
+                raise
+            delay = random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+            log.warning("Attempt %d failed (%s); retrying in %.2fs", attempt + 1, e, delay)
+            time.sleep(delay)
+            attempt += 1
@@ -0,0 +1,324 @@
+import array
+import logging
+import os
+import struct
+import sys
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import pygame
+
+SESSION_BASE = 'session'
+
+log = logging.getLogger(__name__)
+
+MAGIC = b'ICSS'
+VERSION = 1
+FULL, DELTA = 0, 1
+NO_STRING = 0xFFFFFFFF
+# magic, version, kind, light mode, payload size, payload crc32, string count,
+# sidebar names, canvas rows, removed ids, next canvas id, scroll offset
+HEADER = struct.Struct('<4sHBBIIIIIIIi')
+
+# Canvas rows are stored column by column, one packed u32/i32 array each
+ROW_COLUMNS = (('id', 'I'), ('depth', 'I'), ('name', 'I'), ('pair_a', 'I'), ('pair_b', 'I'),
+               ('x', 'i'), ('y', 'i'), ('w', 'i'), ('h', 'i'))
+
+
+def _pack(typecode, values):
+    packed = array.array(typecode, values)
+    if sys.byteorder != 'little':
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def _unpack(typecode, data, offset, count):
+    """count items of typecode from data at offset, as (list, new offset)"""
+    values = array.array(typecode)
+    end = offset + values.itemsize * count
+    values.frombytes(data[offset:end])
+    if sys.byteorder != 'little':
+        values.byteswap()
+    return values.tolist(), end
+
+
+class Segment:
+    """One save: everything (FULL) or what changed since the last save (DELTA).
+
+    rows are (id, depth, name, pair, (x, y, w, h)) for canvas elements that
+    were added or changed, pair being the (el1, el2) a still-pending
+    placeholder is waiting on, or None. removed lists ids taken off the
+    canvas. sidebar holds discovered names in order, appended to what the
+    earlier segments already listed.
+    """
+
+    def __init__(self, kind, sidebar=(), rows=(), removed=(), next_id=1, scroll=0, light=True):
+        self.kind = kind
+        self.sidebar = list(sidebar)
+        self.rows = list(rows)
+        self.removed = list(removed)
+        self.next_id = next_id
+        self.scroll = scroll
+        self.light = light
+
+    def encode(self):
+        """Header plus payload: a string table, then one packed array per column"""
+        ids = {}
+        strings = []
+
+        def string_id(text):
+            if text is None:
+                return NO_STRING
+            i = ids.get(text)
+            if i is None:
+                i = ids[text] = len(strings)
+                strings.append(text.encode('utf-8'))
+            return i
+
+        sidebar = [string_id(name) for name in self.sidebar]
+        columns = [[] for _ in ROW_COLUMNS]
+        for elem_id, depth, name, pair, (x, y, w, h) in self.rows:
+            pair_a, pair_b = pair if pair else (None, None)
+            for column, value in zip(columns, (elem_id, depth, string_id(name), string_id(pair_a),
+                                               string_id(pair_b), x, y, w, h)):
+                column.append(value)
+
+        offsets = [0]
+        for s in strings:
+            offsets.append(offsets[-1] + len(s))
+        parts = [_pack('I', offsets), b''.join(strings), _pack('I', sidebar)]
+        parts.extend(_pack(typecode, column) for (_, typecode), column in zip(ROW_COLUMNS, columns))
+        parts.append(_pack('I', self.removed))
+        payload = b''.join(parts)
+
+        header = HEADER.pack(MAGIC, VERSION, self.kind, int(self.light), len(payload),
+                             zlib.crc32(payload), len(strings), len(self.sidebar), len(self.rows),
+                             len(self.removed), self.next_id, int(self.scroll))
+        return header + payload
+
+    @classmethod
+    def decode(cls, data, offset=0):
+        """(segment, offset after it); ValueError if it is torn or damaged"""
+        if len(data) - offset < HEADER.size:
+            raise ValueError("truncated header")
+        (magic, version, kind, light, size, crc, string_count, sidebar_count, row_count,
+         removed_count, next_id, scroll) = HEADER.unpack_from(data, offset)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"not a version {VERSION} session segment")
+        start = offset + HEADER.size
+        payload = data[start:start + size]
+        if len(payload) != size or zlib.crc32(payload) != crc:
+            raise ValueError("damaged segment")
+
+        offsets, pos = _unpack('I', payload, 0, string_count + 1)
+        blob = payload[pos:pos + offsets[-1]]
+        strings = [blob[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(string_count)]
+        pos += offsets[-1]
+
+        sidebar, pos = _unpack('I', payload, pos, sidebar_count)
+        columns = []
+        for _, typecode in ROW_COLUMNS:
+            column, pos = _unpack(typecode, payload, pos, row_count)
+            columns.append(column)
+        removed, pos = _unpack('I', payload, pos, removed_count)
+
+        rows = []
+        for elem_id, depth, name, pair_a, pair_b, x, y, w, h in zip(*columns):
+            pair = (strings[pair_a], strings[pair_b]) if pair_a != NO_STRING else None
+            rows.append((elem_id, depth, strings[name], pair, (x, y, w, h)))
+        segment = cls(kind, [strings[i] for i in sidebar], rows, removed, next_id, scroll, bool(light))
+        return segment, start + size
+
+
+class SessionState:
+    """A saved session rebuilt by applying segments in order"""
+
+    def __init__(self):
+        self.sidebar = []
+        self.canvas = {}  # id -> row
+        self.next_id = 1
+        self.scroll = 0
+        self.light = True
+
+    def apply(self, segment):
+        if segment.kind == FULL:
+            self.sidebar = []
+            self.canvas = {}
+        self.sidebar.extend(segment.sidebar)
+        for row in segment.rows:
+            self.canvas[row[0]] = row
+        for elem_id in segment.removed:
+            self.canvas.pop(elem_id, None)
+        self.next_id = segment.next_id
+        self.scroll = segment.scroll
+        self.light = segment.light
+
+    def to_segment(self):
+        return Segment(FULL, self.sidebar, self.canvas.values(), (), self.next_id, self.scroll, self.light)
+
+
+class SessionStore:
+    """Saves the canvas, discovered elements and scroll position between runs.
+
+    ``<base>.snapshot`` holds one FULL segment and ``<base>.log`` the DELTA
+    segments appended since. A save only captures what changed (the
+    canvas's changed ids and sidebar names past the last save) on the
+    calling thread; encoding and writing happen on a single writer thread.
+    Once the log outgrows the snapshot, the writer folds it into a new
+    snapshot, the same way cache_store.JournaledCacheStore compacts. Each
+    segment carries a CRC, so a torn final append is dropped on load.
+    """
+
+    def __init__(self, base_path=SESSION_BASE, interval=5000, compact_min_bytes=64 * 1024):
+        self.snapshot_path = base_path + '.snapshot'
+        self.log_path = base_path + '.log'
+        self.interval = interval  # milliseconds between autosaves
+        self.compact_min_bytes = compact_min_bytes
+
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="session")
+        self._saved_sidebar = 0
+        self._saved_view = None
+        # Nothing on disk is known to match this game until it is loaded or fully saved
+        self._needs_full = True
+        self._last_save = None
+        self._last_write = None
+
+    # Loading
+
+    def load(self):
+        """The saved SessionState, or None if there is no saved session"""
+        if not os.path.exists(self.snapshot_path):
+            return None
+        state = SessionState()
+        try:
+            with open(self.snapshot_path, 'rb') as f:
+                snapshot, _ = Segment.decode(f.read())
+        except (OSError, ValueError) as e:
+            log.warning("Could not load %s: %s", self.snapshot_path, e)
+            return None
+        state.apply(snapshot)
+
+        if os.path.exists(self.log_path):
+            with open(self.log_path, 'rb') as f:
+                data = f.read()
+            offset = 0
+            while offset < len(data):
+                try:
+                    segment, offset_after = Segment.decode(data, offset)
+                except ValueError:
+                    log.warning("Dropping damaged tail of %s", self.log_path)
+                    with open(self.log_path, 'r+b') as f:
+                        f.truncate(offset)
+                    break
+                state.apply(segment)
+                offset = offset_after
+        return state
+
+    def load_into(self, game):
+        """Restore the saved session into a freshly made game; False if there was none"""
+        state = self.load()
+        if state is None:
+            return False
+
+        for name in state.sidebar:
+            game.add_discovered_element(name)
+
+        canvas = game.canvas_elements
+        for elem_id, depth, name, pair, rect in sorted(state.canvas.values(), key=lambda row: row[1]):
+            elem = {"id": elem_id, "element": {"name": name}, "rect": pygame.Rect(rect)}
+            if pair:
+                # The answer may well be cached by now; if not, ask again
+                elem["pending"] = game.combiner.combine_async(*pair)
+                elem["pair"] = pair
+            canvas.add(elem, depth=depth)
+        canvas.next_id = max(canvas.next_id, state.next_id)
+        canvas.take_changes()
+
+        game.is_light_mode = state.light
+        game.scroll_offset = state.scroll
+        game.calculate_max_scroll()
+        game.dirty.mark_all()
+
+        self._saved_sidebar = len(game.sidebar.elements)
+        self._saved_view = (game.scroll_offset, game.is_light_mode)
+        self._needs_full = False
+        return True
+
+    # Saving
+
+    def capture(self, game, full=False):
+        """What needs writing, taken on the game's thread; None if nothing changed"""
+        canvas = game.canvas_elements
+        changed = canvas.take_changes()
+        names = game.sidebar.elements
+        view = (game.scroll_offset, game.is_light_mode)
+
+        if full:
+            kind, ids, sidebar = FULL, [elem["id"] for elem in canvas], names
+        else:
+            kind, ids, sidebar = DELTA, changed, names[self._saved_sidebar:]
+            if not ids and not sidebar and view == self._saved_view:
+                return None
+
+        rows = []
+        removed = []
+        for elem_id in ids:
+            elem = canvas.get(elem_id)
+            if elem is None:
+                removed.append(elem_id)
+                continue
+            rows.append((elem_id, canvas.depth(elem_id), elem["element"]["name"],
+                         elem.get("pair"), tuple(elem["rect"])))
+
+        self._saved_sidebar = len(names)
+        self._saved_view = view
+        return Segment(kind, [element["name"] for element in sidebar], rows, removed,
+                       canvas.next_id, view[0], view[1])
+
+    def save(self, game, wait=False):
+        """Queue a write of what changed since the last save"""
+        full, self._needs_full = self._needs_full, False
+        segment = self.capture(game, full)
+        if segment is not None:
+            self._last_write = self._executor.submit(self._write, segment)
+        if wait and self._last_write is not None:
+            self._last_write.result()
+
+    def autosave(self, game, now):
+        """Save every interval milliseconds of game time"""
+        if self._last_save is None:
+            self._last_save = now
+        elif now - self._last_save >= self.interval:
+            self._last_save = now
+            self.save(game)
+
+    def _write(self, segment):
+        try:
+            if segment.kind == FULL:
+                self._write_snapshot(segment)
+                return
+            with open(self.log_path, 'ab') as f:
+                f.write(segment.encode())
+                f.flush()
+                os.fsync(f.fileno())
+            if os.path.getsize(self.log_path) > max(self.compact_min_bytes,
+                                                    os.path.getsize(self.snapshot_path)):
+                self._write_snapshot(self.load().to_segment())
+        except Exception as e:
+            # Whatever this segment held is only in memory now; write it all next time
+            log.warning("Error saving session: %s", e)
+            self._needs_full = True
+
+    def _write_snapshot(self, segment):
+        """Replace the snapshot with a FULL segment and empty the log"""
+        tmp_path = self.snapshot_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(segment.encode())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+        if os.path.exists(self.log_path):
+            os.remove(self.log_path)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
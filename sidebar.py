@@ -0,0 +1,115 @@
+import math
+from collections import defaultdict
+
+from key_normalizer import default_normalizer
+
+
+class SearchIndex:
+    """Substring index over element names for type-to-filter search.
+
+    Names are matched on their canonical form (no emoji, case folded), so
+    "wat" finds "💧Water". Every name is split into trigrams; a query of
+    three or more characters only checks the names listed under its rarest
+    trigram. Shorter queries scan, and a query that extends the previous one
+    only re-checks the previous matches.
+    """
+
+    def __init__(self, normalizer=default_normalizer):
+        self.normalizer = normalizer
+        self._texts = []  # position -> canonical search text
+        self._trigrams = defaultdict(list)  # trigram -> positions, ascending
+
+        self._last_query = None
+        self._last_matches = None
+
+    def __len__(self):
+        return len(self._texts)
+
+    def add(self, name):
+        """Index the next name; positions follow the order names are added"""
+        position = len(self._texts)
+        text = self.normalizer.canonical_name(name)
+        self._texts.append(text)
+        for trigram in {text[i:i + 3] for i in range(len(text) - 2)}:
+            self._trigrams[trigram].append(position)
+
+        if self._last_matches is not None and self._last_query in text:
+            self._last_matches.append(position)
+        return position
+
+    def search(self, query):
+        """Positions of names containing query, in the order they were added"""
+        query = self.normalizer.canonical_name(query)
+        if not query:
+            return None  # no filter
+
+        if self._last_matches is not None and query.startswith(self._last_query):
+            candidates = self._last_matches
+        elif len(query) >= 3:
+            postings = [self._trigrams.get(query[i:i + 3], ()) for i in range(len(query) - 2)]
+            candidates = min(postings, key=len)
+        else:
+            candidates = range(len(self._texts))
+
+        texts = self._texts
+        matches = [p for p in candidates if query in texts[p]]
+        self._last_query = query
+        self._last_matches = matches
+        return matches
+
+
+class SidebarModel:
+    """Layout of the element list, independent of how many entries there are.
+
+    Rows are uniform, so the rows that intersect the viewport follow directly
+    from the scroll offset and only those are ever laid out or drawn. When a
+    filter is active, rows map to the matching elements only.
+    """
+
+    def __init__(self, elements, row_height, row_gap, viewport_height, top_padding=10,
+                 normalizer=default_normalizer):
+        self.elements = elements
+        self.row_height = row_height
+        self.row_stride = row_height + row_gap
+        self.viewport_height = viewport_height
+        self.top_padding = top_padding  # space between the viewport top and the first row
+
+        self.index = SearchIndex(normalizer)
+        for element in elements:
+            self.index.add(element["name"])
+        self.query = ""
+        self._matches = None  # element positions shown while filtering
+
+    def __len__(self):
+        return len(self.elements) if self._matches is None else len(self._matches)
+
+    def add(self, element):
+        self.elements.append(element)
+        self.index.add(element["name"])
+        # The index extends the current matches in place when the name fits
+
+    def set_query(self, query):
+        self.query = query
+        self._matches = self.index.search(query)
+
+    def element_at(self, row):
+        return self.elements[row if self._matches is None else self._matches[row]]
+
+    def content_height(self):
+        return len(self) * self.row_stride
+
+    def max_scroll(self):
+        return max(0, self.content_height() - self.viewport_height)
+
+    def visible_range(self, scroll_offset):
+        """Rows [first, last) that intersect the viewport at this offset"""
+        shift = scroll_offset - self.top_padding
+        first = max(0, math.floor((shift - self.row_height) / self.row_stride) + 1)
+        last = min(len(self), math.ceil((shift + self.viewport_height) / self.row_stride))
+        return first, max(first, last)
+
+    def visible_rows(self, scroll_offset):
+        """Yield (row, y) for visible rows, y relative to the viewport top"""
+        first, last = self.visible_range(scroll_offset)
+        for row in range(first, last):
+            yield row, self.top_padding + row * self.row_stride - scroll_offset
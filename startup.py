@@ -0,0 +1,60 @@
+import threading
+import time
+from contextlib import contextmanager
+
+
+class StartupTimer:
+    """Timing breakdown of the way to the first frame.
+
+    phase() times a step on the calling thread, background() runs one on a
+    daemon thread. report() prints everything finished so far; anything
+    that finishes after it is printed as it lands.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = []  # (name, start offset, duration) in seconds
+        self._lock = threading.Lock()
+        self._reported = False
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._record(name, start, time.perf_counter())
+
+    def background(self, name, fn, *args):
+        def run():
+            with self.phase(f"{name} (background)"):
+                fn(*args)
+        thread = threading.Thread(target=run, name=name, daemon=True)
+        thread.start()
+        return thread
+
+    def mark(self, name):
+        """Record a point in time, such as the first frame reaching the screen"""
+        now = time.perf_counter()
+        self._record(name, now, now)
+
+    def _record(self, name, start, end):
+        with self._lock:
+            entry = (name, start - self.started, end - start)
+            self.phases.append(entry)
+            if self._reported:
+                print(self._format(entry))
+
+    def report(self):
+        with self._lock:
+            print("Startup:")
+            for entry in self.phases:
+                print(self._format(entry))
+            self._reported = True
+
+    @staticmethod
+    def _format(entry):
+        name, offset, duration = entry
+        if duration:
+            return f"  {name:<28} {duration * 1000:8.1f}ms  (done at {(offset + duration) * 1000:.1f}ms)"
+        return f"  {name:<28} {'':>10}  at {offset * 1000:.1f}ms"
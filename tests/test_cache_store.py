@@ -0,0 +1,105 @@
+import json
+import os
+
+from cache_store import JournaledCacheStore
+
+
+def make_store(tmp_path, **kwargs):
+    kwargs.setdefault('legacy_path', None)
+    return JournaledCacheStore(base_path=str(tmp_path / 'cache'), fsync=False, **kwargs)
+
+
+def test_round_trip(tmp_path):
+    store = make_store(tmp_path)
+    store.load()
+    store.append({"fire+water": "💨Steam"})
+    store.append({"earth+water": "🌱Mud"})
+    store.close()
+
+    assert make_store(tmp_path).load() == {"fire+water": "💨Steam", "earth+water": "🌱Mud"}
+
+
+def test_torn_final_write_is_dropped(tmp_path):
+    store = make_store(tmp_path)
+    store.load()
+    store.append({"fire+water": "💨Steam"})
+    store.close()
+    with open(store.log_path, 'ab') as f:
+        f.write('["earth+water", "🌱M'.encode('utf-8'))
+
+    reopened = make_store(tmp_path)
+    assert reopened.load() == {"fire+water": "💨Steam"}
+    # The damaged tail is cut off, so the next append starts on a clean line
+    reopened.append({"air+air": "💨Wind"})
+    reopened.close()
+    assert make_store(tmp_path).load() == {"fire+water": "💨Steam", "air+air": "💨Wind"}
+
+
+def test_compaction_folds_log_into_snapshot(tmp_path):
+    store = make_store(tmp_path, compact_threshold=10)
+    store.load()
+    for i in range(25):
+        store.append({f"a{i}+b": f"r{i}"})
+    store.compact()
+    store.close()
+
+    assert not os.path.exists(store.rotated_log_path)
+    assert len(make_store(tmp_path).load()) == 25
+
+
+def test_crash_after_rotation_is_recovered(tmp_path):
+    store = make_store(tmp_path, compact_threshold=10 ** 6)
+    store.load()
+    store.append({f"a{i}+b": f"r{i}" for i in range(50)})
+    store.close()
+    # Simulate dying right after the log was rotated, before it was folded in
+    os.replace(store.log_path, store.rotated_log_path)
+
+    reopened = make_store(tmp_path)
+    assert len(reopened.load()) == 50
+    assert not os.path.exists(reopened.rotated_log_path)
+
+    # Compaction works again afterwards instead of being blocked for good
+    for i in range(200):
+        reopened.append({f"n{i}+b": "r"})
+    reopened.compact()
+    reopened.close()
+    assert not os.path.exists(reopened.rotated_log_path)
+    assert len(make_store(tmp_path).load()) == 250
+
+
+def test_leftover_snapshot_temp_file_is_ignored(tmp_path):
+    store = make_store(tmp_path)
+    store.load()
+    store.append({"fire+water": "💨Steam"})
+    store.close()
+    with open(store.snapshot_path + '.tmp', 'w', encoding='utf-8') as f:
+        f.write('["half written')
+
+    assert make_store(tmp_path).load() == {"fire+water": "💨Steam"}
+    assert not os.path.exists(store.snapshot_path + '.tmp')
+
+
+def test_legacy_json_is_imported_once(tmp_path):
+    legacy = tmp_path / 'element_cache.json'
+    legacy.write_text(json.dumps({"fire+water": "💨Steam"}), encoding='utf-8')
+
+    store = make_store(tmp_path, legacy_path=str(legacy))
+    assert store.load() == {"fire+water": "💨Steam"}
+    store.append({"earth+water": "🌱Mud"})
+    store.close()
+
+    # Later edits to the JSON file are not imported again
+    legacy.write_text(json.dumps({"air+air": "💨Wind"}), encoding='utf-8')
+    assert make_store(tmp_path, legacy_path=str(legacy)).load() == {
+        "fire+water": "💨Steam", "earth+water": "🌱Mud"}
+
+
+def test_replace_all(tmp_path):
+    store = make_store(tmp_path)
+    store.load()
+    store.append({"a+b": "old"})
+    store.replace_all({"c+d": "new"})
+    store.close()
+
+    assert make_store(tmp_path).load() == {"c+d": "new"}
@@ -0,0 +1,95 @@
+import random
+
+import pytest
+
+pygame = pytest.importorskip("pygame")
+
+from canvas import Canvas
+
+
+def place(canvas, x, y, w=120, h=45, name="🔥Fire"):
+    elem = {"element": {"name": name}, "rect": pygame.Rect(x, y, w, h)}
+    canvas.add(elem)
+    return elem
+
+
+def test_topmost_first():
+    canvas = Canvas()
+    bottom = place(canvas, 0, 0)
+    middle = place(canvas, 20, 10)
+    top = place(canvas, 40, 20)
+    assert canvas.at_point((50, 30)) is top
+    assert canvas.at_point((25, 15)) is middle
+    assert canvas.at_point((5, 5)) is bottom
+    assert canvas.colliding(pygame.Rect(45, 25, 5, 5)) == [top, middle, bottom]
+    assert canvas.colliding(pygame.Rect(45, 25, 5, 5), exclude=middle) == [top, bottom]
+    assert list(canvas) == [bottom, middle, top]
+
+
+def test_remove_and_readd_keeps_id():
+    canvas = Canvas()
+    first = place(canvas, 0, 0)
+    second = place(canvas, 10, 10)
+    first_id = first["id"]
+
+    canvas.remove(first)
+    assert first not in canvas
+    assert canvas.at_point((5, 5)) is None
+    first["rect"].topleft = (30, 20)
+    assert canvas.add(first) == first_id
+    # Dropped again, it is now on top
+    assert canvas.at_point((35, 25)) is first
+    assert canvas.depth(first_id) > canvas.depth(second["id"])
+    assert place(canvas, 500, 500)["id"] == second["id"] + 1
+
+
+def test_rects_straddling_cell_edges():
+    canvas = Canvas(cell_size=64)
+    elem = place(canvas, 60, -4, w=10, h=10)  # spans four cells around (64, 0)
+    for point in ((60, -4), (63, -1), (64, 0), (69, 5)):
+        assert canvas.at_point(point) is elem
+    # right and bottom are exclusive
+    assert canvas.at_point((70, 0)) is None
+    assert canvas.at_point((64, 6)) is None
+    assert canvas.colliding(pygame.Rect(69, 5, 1, 1)) == [elem]
+    assert canvas.colliding(pygame.Rect(70, 6, 50, 50)) == []
+    # centre (65, 1) is exactly on the radius
+    assert [e for _, e in canvas.near((128, 1), 63)] == [elem]
+    assert canvas.near((129, 1), 63) == []
+
+    canvas.remove(elem)
+    assert not canvas._cells
+
+
+def test_matches_linear_scans():
+    rng = random.Random(1)
+    canvas = Canvas(cell_size=64)
+    on_canvas = []
+    for _ in range(500):
+        on_canvas.append(place(canvas, rng.randint(-300, 900), rng.randint(-300, 700),
+                               rng.randint(1, 200), rng.randint(1, 90)))
+    # Pick some up and drop them elsewhere
+    for elem in rng.sample(on_canvas, 100):
+        canvas.remove(elem)
+        on_canvas.remove(elem)
+        if rng.random() < 0.5:
+            elem["rect"].topleft = (rng.randint(-300, 900), rng.randint(-300, 700))
+            canvas.add(elem)
+            on_canvas.append(elem)
+
+    assert len(canvas) == len(on_canvas)
+    assert list(canvas) == on_canvas
+    for _ in range(300):
+        point = (rng.randint(-350, 1000), rng.randint(-350, 800))
+        under = [elem for elem in on_canvas if elem["rect"].collidepoint(point)]
+        assert canvas.at_point(point) is (under[-1] if under else None)
+
+        rect = pygame.Rect(point, (rng.randint(1, 150), rng.randint(1, 150)))
+        overlapping = [elem for elem in reversed(on_canvas) if elem["rect"].colliderect(rect)]
+        assert canvas.colliding(rect) == overlapping
+
+        radius = rng.randint(1, 200)
+        within = {elem["id"] for elem in on_canvas
+                  if (elem["rect"].centerx - point[0]) ** 2 + (elem["rect"].centery - point[1]) ** 2
+                  <= radius * radius}
+        assert {elem["id"] for _, elem in canvas.near(point, radius)} == within
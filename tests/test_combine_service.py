@@ -0,0 +1,55 @@
+import threading
+
+import pytest
+
+pygame = pytest.importorskip("pygame")
+
+from backends import FakeBackend
+from cache_store import JournaledCacheStore
+from canvas import Canvas
+from combine_service import CombineClient, CombineService
+from game_logic import ElementCombiner
+from prefetch import Prefetcher
+
+
+@pytest.fixture
+def client(tmp_path):
+    store = JournaledCacheStore(base_path=str(tmp_path / 'cache'), legacy_path=None, fsync=False)
+    combiner = ElementCombiner(backend=FakeBackend(), store=store, compiled_path=None)
+    service = CombineService(combiner, batch_window=0.001)
+    server = service.serve('127.0.0.1', 0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    client = CombineClient(f"http://127.0.0.1:{server.server_address[1]}/", timeout=10)
+    yield client
+    client.shutdown(wait=True)
+    server.shutdown()
+    server.server_close()
+    service.shutdown()
+
+
+def test_client_answers_and_caches(client):
+    answer = client.call_gemini_api("🔥Fire", "💧Water")
+    assert answer != "❓Unknown"
+    assert client.cache[client.make_cache_key("💧Water", "🔥Fire")] == answer
+    assert client.combine_async("🔥Fire", "💧Water").result() == answer
+
+
+def test_prefetcher_runs_against_a_client(client):
+    canvas = Canvas()
+    for name, x in (("🔥Fire", 0), ("💧Water", 60), ("🌍Earth", 120)):
+        canvas.add({"element": {"name": name}, "rect": pygame.Rect(x, 0, 50, 40)})
+    fire = next(iter(canvas))
+    prefetcher = Prefetcher(client)
+    try:
+        prefetcher.focus("🔥Fire", fire["rect"], canvas)
+        queued = list(prefetcher._queued)
+        for future in queued:
+            assert future.result(timeout=10) is None
+    finally:
+        prefetcher.shutdown()
+
+    assert len(queued) == 3
+    assert prefetcher.spent == 3
+    for other in ("🔥Fire", "💧Water", "🌍Earth"):
+        assert client.make_cache_key("🔥Fire", other) in client.cache
@@ -0,0 +1,78 @@
+import os
+import struct
+
+import pytest
+
+from compiled_cache import HEADER, CompiledCache, OverlayCache, compile_cache
+
+
+@pytest.fixture
+def compiled(tmp_path):
+    entries = {"fire+water": "💨Steam", "earth+water": "🌱Mud", "water+water": "💦Puddle",
+               "lake+lake": "🌊Ocean", "ocean+ocean": "🌊Ocean", "日本+火": "🗾Volcano"}
+    path = str(tmp_path / 'cache.compiled')
+    compile_cache(entries, path)
+    cache = CompiledCache(path)
+    yield entries, cache
+    cache.close()
+
+
+def test_round_trip(compiled):
+    entries, cache = compiled
+    assert len(cache) == len(entries)
+    assert dict(cache.items()) == entries
+    for key, value in entries.items():
+        assert cache[key] == value
+        assert key in cache
+
+
+def test_missing_keys(compiled):
+    _, cache = compiled
+    assert cache.get("air+air") is None
+    assert "air+air" not in cache
+    assert 42 not in cache
+    with pytest.raises(KeyError):
+        cache["air+air"]
+
+
+def test_results_are_interned(tmp_path):
+    path = str(tmp_path / 'cache.compiled')
+    keys, strings = compile_cache({"a+a": "🌊Ocean", "b+b": "🌊Ocean", "c+c": "🌊Ocean"}, path)
+    assert (keys, strings) == (3, 4)
+
+
+def test_empty_cache(tmp_path):
+    path = str(tmp_path / 'cache.compiled')
+    compile_cache({}, path)
+    cache = CompiledCache(path)
+    assert len(cache) == 0
+    assert cache.get("a+b") is None
+    cache.close()
+
+
+def test_truncated_file_is_rejected(tmp_path):
+    path = str(tmp_path / 'cache.compiled')
+    compile_cache({"fire+water": "💨Steam", "earth+water": "🌱Mud"}, path)
+    with open(path, 'r+b') as f:
+        f.truncate(os.path.getsize(path) - 3)
+    with pytest.raises(ValueError):
+        CompiledCache(path)
+
+
+def test_wrong_magic_is_rejected(tmp_path):
+    path = str(tmp_path / 'cache.compiled')
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(b'NOTCACHE', 1, 0, 0, 0) + struct.pack('<I', 0))
+    with pytest.raises(ValueError):
+        CompiledCache(path)
+
+
+def test_overlay_wins_and_takes_writes(compiled):
+    _, cache = compiled
+    overlay = OverlayCache(cache, {"fire+water": "🌫️Fog"})
+    overlay["air+air"] = "💨Wind"
+    assert overlay["fire+water"] == "🌫️Fog"
+    assert overlay.get("earth+water") == "🌱Mud"
+    assert overlay["air+air"] == "💨Wind"
+    assert len(overlay) == len(cache) + 1
+    assert overlay.overlay == {"fire+water": "🌫️Fog", "air+air": "💨Wind"}
@@ -0,0 +1,53 @@
+import pytest
+
+from element_registry import ElementRegistry, clean_element_name
+
+
+@pytest.mark.parametrize("reply, name", [
+    ("💨Steam", "💨Steam"),
+    ("Output: 🔥 Fire", "🔥Fire"),
+    ("Result - Steam", "Steam"),
+    ("1. Answer: \"Mud\"", "Mud"),
+    ("Input: Fire + Water\nOutput: 💨Steam", "💨Steam"),
+    ("Fire + Water = 💨Steam", "💨Steam"),
+    ("Fire + Water -> 💨 Steam", "💨Steam"),
+    # Markdown and chatter around the answer
+    ("**Output:** 💨Steam", "💨Steam"),
+    ("`💨Steam`", "💨Steam"),
+    ("Output:\n💨Steam", "💨Steam"),
+    ("```\n💨Steam\n```", "💨Steam"),
+    ("```text\n💨Steam\n```", "💨Steam"),
+    ("Sure! Here you go:\n💨Steam", "💨Steam"),
+    ("Sure, here you go:\n\n**💨 Steam**", "💨Steam"),
+    # Hyphens, equals signs and symbols that belong to the name
+    ("Result-Driven Design", "Result-Driven Design"),
+    ("E=mc²", "E=mc²"),
+    ("St. Elmo's Fire.", "St. Elmo's Fire"),
+    ("Coca-Cola™", "Coca-Cola™"),
+    ("snake_case", "snake_case"),
+])
+def test_clean_element_name(reply, name):
+    assert clean_element_name(reply) == name
+
+
+@pytest.mark.parametrize("reply", [
+    "",
+    "🔥",
+    "Fire + Water",
+    "Sure! Here is the answer you asked for",
+    "The answer is 💨Steam",
+    "Output:",
+    "```\n```",
+    "A very long answer that goes on for many more words than any element",
+])
+def test_unusable_replies(reply):
+    assert clean_element_name(reply) is None
+
+
+def test_registry_prefers_emoji_form():
+    registry = ElementRegistry()
+    lake = registry.register("lake")
+    assert registry.register("🌊Lake") == registry.register("🏞️Lake") == lake
+    assert registry.display(lake) == "🌊Lake"
+    assert registry.register("Ocean") != lake
+    assert len(registry) == 2
@@ -0,0 +1,38 @@
+from concurrent.futures import Future
+
+import pytest
+
+pygame = pytest.importorskip("pygame")
+
+from backends import FakeBackend
+from cache_store import JournaledCacheStore
+from game import ACTIVE_FPS, IDLE_AFTER, IDLE_FPS, Game
+from game_logic import ElementCombiner
+
+
+@pytest.fixture
+def game(tmp_path):
+    pygame.display.init()
+    pygame.font.init()
+    screen = pygame.display.set_mode((800, 600))
+    store = JournaledCacheStore(base_path=str(tmp_path / 'cache'), legacy_path=None, fsync=False)
+    combiner = ElementCombiner(backend=FakeBackend(), store=store, compiled_path=None)
+    try:
+        yield Game(screen, combiner)
+    finally:
+        combiner.shutdown(wait=True)
+        pygame.quit()
+
+
+def test_idle_throttle_waits_for_pending_combinations(game):
+    idle = game.last_activity_time + IDLE_AFTER + 1
+    assert game.target_fps(idle) == IDLE_FPS
+
+    future = Future()
+    game.canvas_elements.add({"element": {"name": "⏳..."}, "rect": pygame.Rect(100, 100, 120, 45),
+                              "pending": future, "pair": ("🔥Fire", "💧Water")})
+    assert game.target_fps(idle) == ACTIVE_FPS
+
+    future.set_result("💨Steam")
+    game.resolve_pending_elements()
+    assert game.target_fps(idle) == IDLE_FPS
@@ -0,0 +1,155 @@
+import json
+
+import pytest
+
+from backends import FakeBackend
+from cache_store import JournaledCacheStore
+from compiled_cache import compile_cache
+from game_logic import MAX_BATCH_SIZE, ElementCombiner, parse_batch_response
+from key_normalizer import default_normalizer
+
+
+class EditedBackend(FakeBackend):
+    """FakeBackend whose batch replies go through edit() first"""
+
+    def __init__(self, edit=lambda reply: reply):
+        super().__init__()
+        self.edit = edit
+        self.batch_calls = 0
+        self.single_calls = 0
+
+    def generate(self, prompt):
+        reply = super().generate(prompt)
+        if reply.startswith('['):
+            self.batch_calls += 1
+            return self.edit(reply)
+        self.single_calls += 1
+        return reply
+
+
+@pytest.fixture
+def make_combiner(tmp_path):
+    combiners = []
+
+    def make(backend):
+        store = JournaledCacheStore(base_path=str(tmp_path / f'cache{len(combiners)}'),
+                                    legacy_path=None, fsync=False)
+        combiner = ElementCombiner(backend=backend, store=store, compiled_path=None,
+                                   calls_per_second=1000, burst=1000, max_retries=0)
+        combiners.append(combiner)
+        return combiner
+
+    yield make
+    for combiner in combiners:
+        combiner.shutdown(wait=True)
+
+
+def pairs(count):
+    return [(f"🧪Thing {i}", f"💧Water {i}") for i in range(count)]
+
+
+def assert_answers(results, wanted):
+    fake = FakeBackend()
+    assert list(results) == wanted
+    for (el1, el2), result in results.items():
+        assert default_normalizer.canonical_name(result) == \
+            default_normalizer.canonical_name(fake.combine(el1, el2))
+
+
+# parse_batch_response
+
+def test_parse_plain_and_fenced():
+    reply = '[{"id": 1, "result": "💨Steam"}, {"id": 2, "result": "🌱Mud"}]'
+    assert parse_batch_response(reply, 2) == {1: "💨Steam", 2: "🌱Mud"}
+    assert parse_batch_response(f"```json\n{reply}\n```", 2) == {1: "💨Steam", 2: "🌱Mud"}
+    assert parse_batch_response(f"Here you go:\n{reply}\nEnjoy!", 2) == {1: "💨Steam", 2: "🌱Mud"}
+
+
+def test_parse_keeps_only_usable_items():
+    reply = json.dumps([
+        {"id": 1, "result": "Output: 💨Steam"},   # repaired
+        {"id": 2},                                # no result
+        {"id": 9, "result": "🌋Lava"},            # out of range
+        {"id": "3", "result": "🌋Lava"},          # id isn't a number
+        {"id": 4, "result": "🔥"},                # emoji only
+        {"id": 5, "result": 42},
+    ], ensure_ascii=False)
+    assert parse_batch_response(reply, 5) == {1: "💨Steam"}
+    # Bare strings are matched by position
+    assert parse_batch_response('["💨Steam", "🌱Mud"]', 2) == {1: "💨Steam", 2: "🌱Mud"}
+
+
+@pytest.mark.parametrize("reply", [
+    "",
+    "I can't help with that",
+    '[{"id": 1, "result": "💨Steam"}, {"id": 2, "res',   # cut off
+    '{"id": 1, "result": "💨Steam"}',
+    '[{"id": 1, "result": "💨Steam"},]',
+])
+def test_parse_unusable_replies(reply):
+    assert parse_batch_response(reply, 2) == {}
+
+
+# combine_many
+
+def test_one_call_per_batch(make_combiner):
+    backend = EditedBackend()
+    combiner = make_combiner(backend)
+    wanted = pairs(MAX_BATCH_SIZE + 5)
+    results = combiner.combine_many(wanted)
+
+    assert_answers(results, wanted)
+    assert (backend.batch_calls, backend.single_calls) == (2, 0)
+    assert all(combiner.make_cache_key(*pair) in combiner.cache for pair in wanted)
+
+
+def test_cached_and_repeated_pairs_are_not_asked(make_combiner):
+    backend = EditedBackend()
+    combiner = make_combiner(backend)
+    combiner.combine_many(pairs(3))
+    wanted = pairs(5) + [("💧Water 4", "🧪Thing 4")]
+    results = combiner.combine_many(wanted)
+
+    assert_answers(results, wanted)
+    assert backend.batch_calls == 2
+    assert combiner.api_calls == 2
+    assert results[("💧Water 4", "🧪Thing 4")] == results[("🧪Thing 4", "💧Water 4")]
+
+
+def test_fenced_batch_reply(make_combiner):
+    backend = EditedBackend(lambda reply: f"```json\n{reply}\n```")
+    combiner = make_combiner(backend)
+    wanted = pairs(4)
+    assert_answers(combiner.combine_many(wanted), wanted)
+    assert (backend.batch_calls, backend.single_calls) == (1, 0)
+
+
+def test_partial_batch_reply_falls_back_for_the_rest(make_combiner):
+    # Only the first two items come back
+    backend = EditedBackend(lambda reply: json.dumps(json.loads(reply)[:2], ensure_ascii=False))
+    combiner = make_combiner(backend)
+    wanted = pairs(5)
+    assert_answers(combiner.combine_many(wanted), wanted)
+    assert (backend.batch_calls, backend.single_calls) == (1, 3)
+
+
+def test_unusable_batch_reply_falls_back_to_single_calls(make_combiner):
+    backend = EditedBackend(lambda reply: reply[:len(reply) // 2])  # cut off mid-array
+    combiner = make_combiner(backend)
+    wanted = pairs(4)
+    assert_answers(combiner.combine_many(wanted), wanted)
+    assert (backend.batch_calls, backend.single_calls) == (1, 4)
+    assert combiner.api_calls == 5
+
+
+def test_shutdown_closes_the_compiled_cache(tmp_path):
+    path = str(tmp_path / 'cache.compiled')
+    compile_cache({"fire+water": "💨Steam"}, path)
+    store = JournaledCacheStore(base_path=str(tmp_path / 'cache'), legacy_path=None, fsync=False)
+    combiner = ElementCombiner(backend=FakeBackend(), store=store, compiled_path=path)
+    compiled = combiner._compiled
+    assert combiner.call_gemini_api("🔥Fire", "💧Water") == "💨Steam"
+
+    combiner.shutdown(wait=True)
+    assert compiled._mmap.closed
+    assert combiner._compiled is None
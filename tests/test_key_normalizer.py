@@ -0,0 +1,41 @@
+from key_normalizer import KeyNormalizer, migrate_cache
+
+
+def test_emoji_case_and_whitespace_share_a_key():
+    normalizer = KeyNormalizer()
+    assert normalizer.canonical_name("🌪️Tornado") == "tornado"
+    assert normalizer.canonical_name("🌪Tornado") == "tornado"
+    assert normalizer.canonical_name("  TORNADO ") == "tornado"
+    assert normalizer.canonical_name("🔥Solar   Flare") == "solar flare"
+
+
+def test_keys_are_order_independent():
+    normalizer = KeyNormalizer()
+    assert normalizer.make_key("💧Water", "🔥Fire") == normalizer.make_key("🔥Fire", "💧Water") == "fire+water"
+
+
+def test_keycaps_and_symbols_survive_nfkc():
+    normalizer = KeyNormalizer()
+    assert normalizer.canonical_name("1️⃣One") == "one"
+    assert normalizer.canonical_name("™Brand") == "brand"
+
+
+def test_migration_rekeys_old_entries():
+    old = {"🔥Fire+💧Water": "💨Steam", "Earth+Water": "🌱Mud"}
+    migrated, collisions = migrate_cache(old)
+    assert migrated == {"fire+water": "💨Steam", "earth+water": "🌱Mud"}
+    assert collisions == {}
+
+
+def test_migration_prefers_the_canonical_entry():
+    old = {"Fire+Water": "💨Vapor", "fire+water": "💨Steam", "🔥fire+💧water": "💨Mist"}
+    migrated, collisions = migrate_cache(old)
+    assert migrated == {"fire+water": "💨Steam"}
+    assert sorted(collisions["fire+water"]) == ["💨Mist", "💨Vapor"]
+
+
+def test_migration_is_idempotent():
+    migrated, _ = migrate_cache({"🔥Fire+💧Water": "💨Steam", "Air+Air": "💨Wind"})
+    again, collisions = migrate_cache(migrated)
+    assert again == migrated
+    assert collisions == {}
@@ -0,0 +1,95 @@
+import random
+
+from key_normalizer import default_normalizer
+from recipe_graph import RecipeGraph
+
+ENTRIES = {
+    "fire+water": "💨Steam",
+    "earth+water": "🟫Mud",
+    "fire+mud": "🧱Brick",
+    "brick+brick": "🧱Wall",
+    "steam+wall": "🏭Factory",
+}
+
+
+def key(a, b):
+    return default_normalizer.make_key(a, b)
+
+
+def assert_valid_derivation(graph, name):
+    """Check each step only uses what is already made and name takes level_of(name) rounds"""
+    steps = graph.derivation(name)
+    rounds = {base: 0 for base in graph.base}  # canonical name -> round it is made in
+    for a, b, result in steps:
+        a, b, canonical = (default_normalizer.canonical_name(n) for n in (a, b, result))
+        assert a in rounds and b in rounds
+        assert (a, b) in graph._recipes[canonical] or (b, a) in graph._recipes[canonical]
+        rounds[canonical] = max(rounds[a], rounds[b]) + 1
+    assert steps[-1][2] == name
+    assert rounds[default_normalizer.canonical_name(name)] == graph.level_of(name)
+    return steps
+
+
+def test_levels_from_cache():
+    graph = RecipeGraph.from_cache(ENTRIES)
+    assert graph.level_of("💧Water") == 0
+    assert graph.level_of("💨Steam") == 1
+    assert graph.level_of("🟫Mud") == 1
+    assert graph.level_of("🧱Brick") == 2
+    assert graph.level_of("🧱Wall") == 3
+    assert graph.level_of("🏭Factory") == 4
+    assert graph.edge_count == len(ENTRIES)
+
+
+def test_derivation():
+    graph = RecipeGraph.from_cache(ENTRIES)
+    steps = assert_valid_derivation(graph, "🏭Factory")
+    # Steam, Mud, Brick, Wall, Factory; Brick is made once although Wall uses it twice
+    assert len(steps) == 5
+    assert graph.derivation("🔥Fire") == []
+    assert graph.derivation("🦄Unicorn") is None
+
+
+def test_incremental_propagation():
+    graph = RecipeGraph()
+    # Nothing here is reachable until Mud is
+    graph.add_combination("🔥Fire", "🟫Mud", "🧱Brick")
+    graph.add_combination("🧱Brick", "🧱Brick", "🧱Wall")
+    assert graph.level_of("🧱Wall") is None
+    assert graph.derivation("🧱Wall") is None
+
+    graph.add_entries({key("🌍Earth", "💧Water"): "🟫Mud"})
+    assert (graph.level_of("🟫Mud"), graph.level_of("🧱Brick"), graph.level_of("🧱Wall")) == (1, 2, 3)
+
+    # A shorter recipe for Brick lowers everything built on it
+    graph.add_combination("🔥Fire", "🌍Earth", "🧱Brick")
+    assert (graph.level_of("🧱Brick"), graph.level_of("🧱Wall")) == (1, 2)
+    assert [step[2] for step in assert_valid_derivation(graph, "🧱Wall")] == ["🧱Brick", "🧱Wall"]
+
+    # A longer one changes nothing, and a repeat isn't counted twice
+    edges = graph.edge_count
+    graph.add_combination("🧱Wall", "🔥Fire", "🧱Brick")
+    graph.add_combination("🧱Wall", "🔥Fire", "🧱Brick")
+    assert graph.level_of("🧱Brick") == 1
+    assert graph.edge_count == edges + 1
+
+
+def test_incremental_matches_rebuild():
+    rng = random.Random(7)
+    names = ["🔥Fire", "💧Water", "🌍Earth", "💨Air"] + [f"Thing {i}" for i in range(60)]
+    entries = {}
+    for _ in range(400):
+        a, b, result = rng.choice(names), rng.choice(names), rng.choice(names[4:])
+        entries.setdefault(key(a, b), result)
+
+    incremental = RecipeGraph()
+    items = list(entries.items())
+    rng.shuffle(items)
+    for k, result in items:
+        incremental.add_entries({k: result})
+    rebuilt = RecipeGraph.from_cache(entries)
+
+    assert incremental.level == rebuilt.level
+    for canonical in rebuilt.level:
+        if canonical not in rebuilt.base:
+            assert_valid_derivation(incremental, incremental.display[canonical])
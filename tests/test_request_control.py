@@ -0,0 +1,24 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from request_control import SingleFlight, TokenBucket
+
+
+def test_token_bucket_available():
+    bucket = TokenBucket(rate=0.001, capacity=3)
+    assert bucket.available() == 3
+    bucket.acquire(2)
+    assert 1 <= bucket.available() < 1.01
+
+
+def test_single_flight_shares_one_call():
+    flight = SingleFlight()
+    future, leader = flight.claim("fire+water")
+    assert leader and len(flight) == 1
+    # Asked again while the first call is still running: no second call
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        shared = flight.submit("fire+water", executor, lambda: "🌫️Fog")
+    assert shared is future and not shared.done()
+    flight.settle("fire+water", future, "💨Steam")
+    assert shared.result() == "💨Steam"
+    assert len(flight) == 0
+    assert flight.do("fire+water", lambda: "🌫️Fog") == "🌫️Fog"
@@ -0,0 +1,89 @@
+import pytest
+
+from sidebar import SearchIndex, SidebarModel
+
+NAMES = ["🔥Fire", "💧Water", "🌍Earth", "💨Air", "🌊Waterfall", "🍉Watermelon", "🧱Brick", "🫖Tea Kettle"]
+
+
+class RecordingTexts(list):
+    """The index's text list, noting which positions a search looks at"""
+
+    def __init__(self, texts):
+        super().__init__(texts)
+        self.read = []
+
+    def __getitem__(self, position):
+        self.read.append(position)
+        return super().__getitem__(position)
+
+
+def make_index(names=NAMES):
+    index = SearchIndex()
+    for name in names:
+        index.add(name)
+    return index
+
+
+def test_search_matches_canonical_substrings():
+    index = make_index()
+    assert index.search("") is None
+    assert index.search("🌊") is None
+    assert index.search("WAT") == [1, 4, 5]
+    assert index.search("💧water") == [1, 4, 5]
+    assert index.search("a") == [1, 2, 3, 4, 5, 7]  # short queries scan
+    assert index.search("ea k") == [7]
+    assert index.search("lava") == []
+
+
+def test_extending_a_query_only_rechecks_its_matches():
+    index = make_index(NAMES * 50)
+    expected = index.search("water")
+    index.search("wat")
+    index._texts = RecordingTexts(index._texts)
+
+    assert index.search("wate") == expected
+    assert sorted(index._texts.read) == sorted(p for p in range(len(NAMES) * 50)
+                                               if "wat" in NAMES[p % len(NAMES)].lower())
+    index._texts.read.clear()
+    assert index.search("waterf") == [p for p in expected if p % len(NAMES) == 4]
+    assert len(index._texts.read) == len(expected)
+
+    # Not an extension, so the trigram postings are used instead
+    index._texts.read.clear()
+    assert index.search("brick") == [p for p in range(len(NAMES) * 50) if p % len(NAMES) == 6]
+    assert len(index._texts.read) == 50
+
+
+def test_adding_while_filtered_extends_the_matches():
+    model = SidebarModel([{"name": name} for name in NAMES], row_height=40, row_gap=5,
+                         viewport_height=200)
+    model.set_query("wat")
+    assert len(model) == 3
+
+    model.add({"name": "🌀Whirlpool"})
+    assert len(model) == 3
+    model.add({"name": "💦Salt Water"})
+    assert len(model) == 4
+    assert model.element_at(3)["name"] == "💦Salt Water"
+
+    # The live matches still seed the next, longer query
+    model.set_query("water")
+    assert [model.element_at(row)["name"] for row in range(len(model))] == \
+        ["💧Water", "🌊Waterfall", "🍉Watermelon", "💦Salt Water"]
+    model.set_query("")
+    assert len(model) == len(NAMES) + 2
+
+
+@pytest.mark.parametrize("query", ["", "e"])
+def test_visible_range_matches_row_geometry(query):
+    model = SidebarModel([{"name": f"🧪Thing {i}"} for i in range(40)] + [{"name": n} for n in NAMES],
+                         row_height=40, row_gap=5, viewport_height=200, top_padding=10)
+    model.set_query(query)
+    for scroll in range(-60, model.max_scroll() + 60, 7):
+        # Rows whose [top, bottom) overlaps the viewport [0, viewport_height)
+        visible = [row for row in range(len(model))
+                   if model.top_padding + row * model.row_stride - scroll < model.viewport_height
+                   and model.top_padding + row * model.row_stride - scroll + model.row_height > 0]
+        first, last = model.visible_range(scroll)
+        assert list(range(first, last)) == visible
+        assert [row for row, _ in model.visible_rows(scroll)] == visible
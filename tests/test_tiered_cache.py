@@ -0,0 +1,25 @@
+from tiered_cache import TieredCache
+
+
+def test_lru_evicts_hot_copies_only():
+    cold = {"a+a": "🅰️A", "b+b": "🅱️B", "c+c": "©️C"}
+    cache = TieredCache(cold, max_entries=2)
+    for key in ("a+a", "b+b", "a+a", "c+c"):
+        assert cache.get(key) == cold[key]
+    stats = cache.stats()
+    assert (stats["hot_entries"], stats["hot_hits"], stats["cold_hits"], stats["evictions"]) == (2, 1, 3, 1)
+    # b+b was least recently used; it is still served from the cold tier
+    assert cache["b+b"] == "🅱️B"
+    assert cache.get("d+d", "missing") == "missing"
+
+
+def test_no_hot_tier_over_a_dict():
+    cold = {"a+a": "🅰️A"}
+    cache = TieredCache(cold, max_entries=0)
+    assert cache.get("a+a") == "🅰️A"
+    assert cache.get("a+a") == "🅰️A"
+    assert cache.get("b+b") is None
+    cache.update({"b+b": "🅱️B"})
+    assert cold["b+b"] == "🅱️B"
+    stats = cache.stats()
+    assert (stats["hot_entries"], stats["hot_bytes"], stats["cold_hits"], stats["misses"]) == (0, 0, 2, 1)
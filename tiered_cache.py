@@ -0,0 +1,127 @@
+import sys
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping
+
+
+class TieredCache(Mapping):
+    """Bounded LRU hot tier in front of the full cache.
+
+    The cold tier is whatever load_cache() produced: a dict rebuilt from the
+    journal, or an OverlayCache whose base lives on disk in a memory-mapped
+    compiled file. Recently used results are kept in the hot tier, which is
+    capped at max_entries and, optionally, max_bytes; the least recently
+    used entries are evicted past either limit. Eviction only drops the hot
+    copy, the entry stays in the cold tier.
+
+    A dict cold tier is already all in memory, so a hot tier over it only
+    holds entries twice. max_entries=0 turns the hot tier off: lookups go
+    straight to the cold tier without the lock or the size accounting, and
+    only the counters are kept.
+
+    get() is the counted lookup. Membership tests, item access and
+    iteration go straight through without touching the counters or the LRU
+    order, so the prefetcher and the recipe graph don't skew the hit rate.
+    """
+
+    def __init__(self, cold, max_entries=10000, max_bytes=None):
+        self.cold = cold
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hot_hits = 0
+        self.cold_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.hot_bytes = 0
+        self._hot = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _entry_size(key, value):
+        return sys.getsizeof(key) + sys.getsizeof(value)
+
+    def get(self, key, default=None):
+        if not self.max_entries:
+            # Counters only; an increment lost to a race just skews stats()
+            value = self.cold.get(key)
+            if value is None:
+                self.misses += 1
+                return default
+            self.cold_hits += 1
+            return value
+
+        with self._lock:
+            value = self._hot.get(key)
+            if value is not None:
+                self._hot.move_to_end(key)
+                self.hot_hits += 1
+                return value
+
+        value = self.cold.get(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return default
+            self.cold_hits += 1
+            self._promote(key, value)
+        return value
+
+    def _promote(self, key, value):
+        """Put an entry at the hot end of the LRU; caller holds the lock"""
+        previous = self._hot.pop(key, None)
+        if previous is not None:
+            self.hot_bytes -= self._entry_size(key, previous)
+        self._hot[key] = value
+        self.hot_bytes += self._entry_size(key, value)
+
+        while self._hot and (len(self._hot) > self.max_entries or
+                             (self.max_bytes is not None and self.hot_bytes > self.max_bytes)):
+            old_key, old_value = self._hot.popitem(last=False)
+            self.hot_bytes -= self._entry_size(old_key, old_value)
+            self.evictions += 1
+
+    def __getitem__(self, key):
+        if not self.max_entries:
+            return self.cold[key]
+        with self._lock:
+            value = self._hot.get(key)
+        if value is not None:
+            return value
+        return self.cold[key]
+
+    def __contains__(self, key):
+        return key in self._hot or key in self.cold
+
+    def __len__(self):
+        return len(self.cold)
+
+    def __iter__(self):
+        return iter(self.cold)
+
+    def items(self):
+        return self.cold.items()
+
+    def __setitem__(self, key, value):
+        self.update({key: value})
+
+    def update(self, entries):
+        # New results are the likeliest to be asked for again soon
+        self.cold.update(entries)
+        if not self.max_entries:
+            return
+        with self._lock:
+            for key, value in entries.items():
+                self._promote(key, value)
+
+    def stats(self):
+        lookups = self.hot_hits + self.cold_hits + self.misses
+        return {
+            "entries": len(self.cold),
+            "hot_entries": len(self._hot),
+            "hot_bytes": self.hot_bytes,
+            "hot_hits": self.hot_hits,
+            "cold_hits": self.cold_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": (self.hot_hits + self.cold_hits) / lookups if lookups else 0.0,
+        }